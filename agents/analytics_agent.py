@@ -1,11 +1,17 @@
 import json
-import time
 from datetime import datetime
-from openai import OpenAI, RateLimitError, APIError
+from openai import OpenAI
+from core.cache import TTLCache
+from core.shared_cache import shared_store
 from core.config import settings
+from core.llm import call_with_fallback
+from core.profiling import trace_stage, record_payload
 from core.prompts import GA4_PLANNER_PROMPT
 from services.ga4_service import GA4Service
+from services.ga4_rollups import GA4RollupStore
 from tools.ga4_tools import GA4_REPORTING_TOOL_SCHEMA, validate_reporting_plan
+from tools.ga4_templates import build_plan_from_template
+from tools.ga4_plan_compiler import compile_reporting_plan, plan_cache_key
 
 class AnalyticsAgent:
     def __init__(self):
@@ -15,33 +21,33 @@ class AnalyticsAgent:
             base_url=settings.LITELLM_BASE_URL
         )
         self.ga4_service = GA4Service()
+        # GA4 report rows keyed by (property_id, canonical plan JSON)
+        self.report_cache = TTLCache(settings.GA4_CACHE_TTL, shared=shared_store("ga4_reports"))
+        # LLM-generated reporting plans keyed by (date, query)
+        self.plan_cache = TTLCache(settings.GA4_CACHE_TTL, shared=shared_store("ga4_plans"))
+        # Daily rollups answer compatible plans without hitting GA4; synced by the prefetch scheduler
+        self.rollup_store = GA4RollupStore() if settings.ROLLUP_ENABLED else None
 
     def _call_gemini_with_backoff(self, messages, json_mode=False):
         """
         Exponential backoff to handle 429 Rate Limits from LiteLLM proxy.
+        JSON plans use the 'planning' stage profiles, prose summaries the 'summary' ones.
         """
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                response_format = None
-                if json_mode:
-                    # Uses the structured schema from ga4_tools.py
-                    response_format = {
-                        "type": "json_object",
-                        "response_schema": GA4_REPORTING_TOOL_SCHEMA["parameters"]
-                    }
-
-                return self.client.chat.completions.create(
-                    model=settings.MODEL_NAME,
-                    messages=messages,
-                    response_format=response_format,
-                    temperature=1.0
-                )
-            except (RateLimitError, APIError) as e:
-                if attempt == max_retries - 1: raise e
-                wait = (2 ** attempt) + 1
-                print(f"Rate limit hit. Retrying in {wait}s...")
-                time.sleep(wait)
+        response_format = None
+        if json_mode:
+            # Uses the structured schema from ga4_tools.py
+            response_format = {
+                "type": "json_object",
+                "response_schema": GA4_REPORTING_TOOL_SCHEMA["parameters"]
+            }
+
+        return call_with_fallback(
+            self.client,
+            "planning" if json_mode else "summary",
+            messages,
+            response_format=response_format,
+            max_retries=5
+        )
 
     def answer_question(self, query: str, property_id: str = None):
         """
@@ -51,31 +57,77 @@ class AnalyticsAgent:
         pid = property_id if property_id else "516810413"
         
         try:
-            # 1. Infer Reporting Plan
-            reporting_plan = self._get_reporting_plan(query)
+            # 1-3. Plan, validate and query GA4
+            result = self.fetch_data(query, pid)
             
-            # 2. Server-side Validation
-            # Ensures the LLM didn't hallucinate invalid metrics
-            validate_reporting_plan(reporting_plan)
-            
-            # 3. Query Live GA4 Data API
-            raw_data = self.ga4_service.run_analytics_report(pid, reporting_plan)
-            
-            if isinstance(raw_data, dict) and "error" in raw_data:
-                return f"I couldn't fetch the data: {raw_data['error']}"
+            if "error" in result:
+                return f"I couldn't fetch the data: {result['error']}"
 
             # 4. Summarize results in Natural Language
-            return self._summarize_data(query, raw_data)
+            return self._summarize_data(query, result["rows"])
             
         except ValueError as ve:
             return f"Validation Error: {str(ve)}"
         except Exception as e:
             return f"Analytics Agent Error: {str(e)}"
 
+    def fetch_data(self, query: str, property_id: str = None):
+        """
+        Raw data mode: returns the validated plan and GA4 rows without summarization.
+        Raises ValueError if the plan fails validation.
+        """
+        pid = property_id if property_id else "516810413"
+
+        # 1. Infer Reporting Plan
+        with trace_stage("ga4_plan"):
+            reporting_plan = self._get_reporting_plan(query)
+
+        # 2. Local repair + canonicalization, then Server-side Validation
+        # Near-miss names and relative dates are fixed here instead of failing the request
+        reporting_plan = compile_reporting_plan(reporting_plan)
+        validate_reporting_plan(reporting_plan)
+
+        # 3. Query Live GA4 Data API
+        with trace_stage("ga4_report"):
+            raw_data = self.run_report(pid, reporting_plan)
+
+        if isinstance(raw_data, dict) and "error" in raw_data:
+            return {"plan": reporting_plan, "rows": [], "error": raw_data["error"]}
+        return {"plan": reporting_plan, "rows": raw_data}
+
+    def run_report(self, property_id: str, plan: dict, refresh: bool = False):
+        """Runs a validated plan against local rollups or GA4, served from cache while fresh."""
+        if self.rollup_store is not None:
+            local_rows = self.rollup_store.answer(property_id, plan)
+            if local_rows is not None:
+                return local_rows
+
+        key = (property_id, plan_cache_key(plan))
+        return self.report_cache.get_or_load(
+            key,
+            lambda: self._fetch_report(property_id, plan),
+            refresh=refresh,
+            # Never cache upstream failures
+            cache_if=lambda data: not (isinstance(data, dict) and "error" in data)
+        )
+
+    def _fetch_report(self, property_id: str, plan: dict):
+        return self.ga4_service.run_analytics_report(property_id, plan)
+
     def _get_reporting_plan(self, query: str):
         """Uses Gemini to translate NL query into a GA4-compatible JSON plan."""
+        # Common query shapes are parsed locally, skipping the LLM round-trip
+        template_plan = build_plan_from_template(query)
+        if template_plan is not None:
+            return template_plan
+
         today = datetime.now().strftime("%Y-%m-%d")
-        
+        return self.plan_cache.get_or_load(
+            (today, query),
+            lambda: self._get_llm_reporting_plan(query, today)
+        )
+
+    def _get_llm_reporting_plan(self, query: str, today: str):
         response = self._call_gemini_with_backoff(
             messages=[
                 {"role": "system", "content": GA4_PLANNER_PROMPT.format(today=today, query=query)},
@@ -87,10 +139,13 @@ class AnalyticsAgent:
 
     def _summarize_data(self, query: str, data: list):
         """Fuses raw JSON data into a clear analyst summary."""
+        with trace_stage("serialize_ga4_rows"):
+            data_json = json.dumps(data)
+        record_payload("ga4_rows_json_bytes", len(data_json))
         response = self._call_gemini_with_backoff(
             messages=[
                 {"role": "system", "content": "You are a professional Analytics Consultant for Property 516810413. Summarize the data clearly. If data is empty, explain that there is no traffic for this period."},
-                {"role": "user", "content": f"User Query: {query}\nRaw GA4 Data: {json.dumps(data)}"}
+                {"role": "user", "content": f"User Query: {query}\nRaw GA4 Data: {data_json}"}
             ]
         )
         return response.choices[0].message.content
\ No newline at end of file
@@ -1,8 +1,11 @@
 import json
-import time
 import pandas as pd
-from openai import OpenAI, RateLimitError, APIError
+from openai import OpenAI
+from core.cache import TTLCache
+from core.shared_cache import shared_store
 from core.config import settings
+from core.llm import call_with_fallback
+from core.profiling import trace_stage, record_payload
 from core.prompts import SEO_ANALYSIS_PROMPT
 from services.sheets_service import SheetsService
 from tools.seo_tools import normalize_seo_dataframe
@@ -15,24 +18,14 @@ class SEOAgent:
             base_url=settings.LITELLM_BASE_URL
         )
         self.sheets_service = SheetsService()
+        # Normalized crawl snapshots keyed by spreadsheet ID
+        self.crawl_cache = TTLCache(settings.SHEETS_CACHE_TTL, shared=shared_store("crawls"))
 
     def _call_gemini_with_backoff(self, messages):
         """
         Exponential backoff to handle 429 Rate Limits from the proxy.
         """
-        max_retries = 5
-        for attempt in range(max_retries):
-            try:
-                return self.client.chat.completions.create(
-                    model=settings.MODEL_NAME,
-                    messages=messages,
-                    temperature=0.7
-                )
-            except (RateLimitError, APIError) as e:
-                if attempt == max_retries - 1: raise e
-                wait = (2 ** attempt) + 1
-                print(f"SEO Agent: Rate limit hit. Retrying in {wait}s...")
-                time.sleep(wait)
+        return call_with_fallback(self.client, "summary", messages, max_retries=5, log_prefix="SEO Agent: ")
 
     def answer_question(self, query: str, spreadsheet_id: str = None):
         """
@@ -42,24 +35,57 @@ class SEOAgent:
         sid = spreadsheet_id if spreadsheet_id else "1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"
         
         try:
-            # 1. Live data ingestion from Google Sheets using Service Account
-            df = self.sheets_service.get_spreadsheet_data(sid)
+            # 1-3. Crawl data and ground-truth metrics
+            result = self.fetch_data(sid)
             
-            if df.empty:
-                return "The SEO audit sheet appears to be empty or inaccessible. Please check permissions."
-
-            # 2. Normalize schema to handle column variations (e.g., 'URL' vs 'Address')
-            df = normalize_seo_dataframe(df)
-
-            # 3. Extract ground-truth metrics to prevent AI hallucinations
-            context = self._extract_audit_summary(df)
+            if "error" in result:
+                return result["error"]
 
             # 4. Generate final insight with Gemini using specialized prompt
-            return self._get_ai_reasoning(query, context)
+            return self._get_ai_reasoning(query, result["summary"])
 
         except Exception as e:
             return f"SEO Agent Error: {str(e)}"
 
+    def fetch_data(self, spreadsheet_id: str = None):
+        """
+        Raw data mode: returns the audit summary and normalized crawl rows without AI reasoning.
+        """
+        sid = spreadsheet_id if spreadsheet_id else "1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"
+
+        # 1-2. Live (or cached) crawl data, normalized to handle column variations
+        with trace_stage("crawl_load"):
+            df = self.load_crawl(sid)
+
+        if df is None:
+            return {"summary": {}, "rows": pd.DataFrame(), "error": "The SEO audit sheet appears to be empty or inaccessible. Please check permissions."}
+
+        # 3. Extract ground-truth metrics to prevent AI hallucinations
+        record_payload("crawl_rows", len(df))
+        with trace_stage("audit_summary"):
+            summary = self._extract_audit_summary(df)
+        return {"summary": summary, "rows": df}
+
+    def load_crawl(self, spreadsheet_id: str, refresh: bool = False):
+        """
+        Returns the normalized crawl DataFrame, served from cache while fresh.
+        Returns None if the sheet is empty or inaccessible.
+        """
+        return self.crawl_cache.get_or_load(
+            spreadsheet_id,
+            lambda: self._fetch_crawl(spreadsheet_id),
+            refresh=refresh
+        )
+
+    def _fetch_crawl(self, spreadsheet_id: str):
+        # Live data ingestion from Google Sheets using Service Account
+        with trace_stage("sheets_fetch"):
+            df = self.sheets_service.get_spreadsheet_data(spreadsheet_id)
+        if not isinstance(df, pd.DataFrame) or df.empty:
+            return None
+        with trace_stage("normalize_seo_dataframe"):
+            return normalize_seo_dataframe(df)
+
     def _extract_audit_summary(self, df: pd.DataFrame):
         """
         Calculates hard numbers (status codes, indexability) before sending to LLM.
@@ -77,9 +103,9 @@ class SEOAgent:
             summary["non_https_samples"] = non_https['address'].head(3).tolist()
 
         if 'title_length' in df.columns:
-            # Ensure numeric conversion for accurate filtering
-            df['title_length'] = pd.to_numeric(df['title_length'], errors='coerce')
-            long_titles = df[df['title_length'] > 60]
+            # Ensure numeric conversion for accurate filtering (without mutating the cached frame)
+            title_length = pd.to_numeric(df['title_length'], errors='coerce')
+            long_titles = df[title_length > 60].assign(title_length=title_length)
             summary["long_titles_count"] = len(long_titles)
             summary["long_titles_samples"] = long_titles[['address', 'title_length']].head(3).to_dict(orient='records')
 
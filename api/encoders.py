@@ -0,0 +1,79 @@
+"""
+api/encoders.py - Compact encodings for raw data mode (columnar JSON, NDJSON, Arrow IPC).
+"""
+import io
+import json
+import pandas as pd
+
+RAW_FORMATS = ("columnar", "ndjson", "arrow")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+def _to_frame(rows) -> pd.DataFrame:
+    """GA4 rows arrive as a list of dicts; SEO rows are already a DataFrame."""
+    if isinstance(rows, pd.DataFrame):
+        return rows
+    return pd.DataFrame(rows or [])
+
+
+def _meta(source: str, result: dict) -> dict:
+    # Everything except the tabular rows: plan, audit summary, error
+    return {"source": source, **{k: v for k, v in result.items() if k != "rows"}}
+
+
+def encode_columnar(payload: dict) -> dict:
+    """{"intent", "results": {source: {plan/summary..., "columns": [...], "data": {col: [...]}}}}"""
+    results = {}
+    for source, result in payload["results"].items():
+        df = _to_frame(result.get("rows"))
+        results[source] = {
+            **_meta(source, result),
+            "row_count": len(df),
+            "columns": [str(c) for c in df.columns],
+            # to_json maps NaN to null and numpy scalars to plain JSON values
+            "data": {str(c): json.loads(df[c].to_json(orient="values")) for c in df.columns}
+        }
+    return {"intent": payload["intent"], "results": results}
+
+
+def encode_ndjson(payload: dict) -> str:
+    """One meta line per source followed by one line per row."""
+    lines = []
+    for source, result in payload["results"].items():
+        lines.append(json.dumps({"type": "meta", "intent": payload["intent"], **_meta(source, result)}, default=str))
+        df = _to_frame(result.get("rows"))
+        if not df.empty:
+            df = df.assign(source=source)
+            lines.append(df.to_json(orient="records", lines=True).rstrip("\n"))
+    return "\n".join(lines) + "\n"
+
+
+def encode_arrow(payload: dict) -> bytes:
+    """
+    Arrow IPC stream of the single result table; plan/summary travel in schema metadata.
+    Requires pyarrow, which is optional.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("Arrow output requires the optional 'pyarrow' package.")
+
+    if len(payload["results"]) != 1:
+        raise ValueError("Arrow output supports a single result table; use 'columnar' or 'ndjson' for multi-source answers.")
+
+    source, result = next(iter(payload["results"].items()))
+    table = pa.Table.from_pandas(_to_frame(result.get("rows")), preserve_index=False)
+    metadata = {
+        "intent": payload["intent"],
+        "meta": json.dumps(_meta(source, result), default=str)
+    }
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
@@ -1,12 +1,20 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Depends, Request
+from fastapi.responses import Response, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, Literal, Dict, Any
+import hmac
 import logging
 
 # Internal imports
 from orchestrator.router import Orchestrator
+from orchestrator.prefetch import PrefetchScheduler
 from core.config import settings
+from core.shared_cache import shared_store
+from api.encoders import MEDIA_TYPES, encode_columnar, encode_ndjson, encode_arrow
+from core.profiling import (
+    SlowRequestLog, SamplingProfiler, start_trace, end_trace, current_trace, trace_stage, record_payload
+)
 
 # Configure logging for production observability
 logging.basicConfig(
@@ -24,6 +32,41 @@ app = FastAPI(
 # Initialize Orchestrator as a singleton
 orchestrator = Orchestrator()
 
+# Slow-request capture and on-demand sampling profiler (see /admin endpoints)
+# With WORKERS > 1 both go through the shared tier so any worker can serve the admin reads
+slow_requests = SlowRequestLog(
+    settings.SLOW_REQUEST_THRESHOLD, settings.SLOW_REQUEST_BUFFER,
+    shared=shared_store("slow_requests"), retention_seconds=settings.SLOW_REQUEST_RETENTION
+)
+profiler = SamplingProfiler(settings.PROFILER_INTERVAL, shared=shared_store("profiler"))
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Records a stage timeline for every request; slow ones are kept in the ring buffer."""
+    if request.url.path.startswith("/admin"):
+        return await call_next(request)
+    trace, token = start_trace(request.url.path)
+    try:
+        response = await call_next(request)
+        record_payload("response_bytes", int(response.headers.get("content-length", 0)))
+        return response
+    finally:
+        trace.finish()
+        end_trace(token)
+        slow_requests.maybe_capture(trace)
+
+# Background cache warming for hot crawls and GA4 reports
+prefetch_scheduler = PrefetchScheduler(orchestrator)
+
+@app.on_event("startup")
+def start_prefetch():
+    if settings.PREFETCH_ENABLED:
+        prefetch_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_prefetch():
+    prefetch_scheduler.stop()
+
 # --- Request & Response Schemas ---
 class QueryRequest(BaseModel):
     """
@@ -42,8 +85,16 @@ class QueryRequest(BaseModel):
         description="Google Sheet ID for SEO data. Defaults to 1zzf4ax... if omitted."
     )
 
+    # Raw data mode for machine consumers: skips all summarization LLM calls
+    format: Literal["text", "columnar", "ndjson", "arrow"] = Field(
+        default="text",
+        description="'text' for a natural-language answer; 'columnar', 'ndjson' or 'arrow' for the validated plan plus raw rows."
+    )
+
 class QueryResponse(BaseModel):
     response: str
+    # Populated in 'columnar' mode with the plan and column-oriented rows per source
+    data: Optional[Dict[str, Any]] = None
 
 # --- API Endpoints ---
 @app.post("/query", response_model=QueryResponse)
@@ -53,10 +104,16 @@ async def handle_query(request: QueryRequest):
     Routes requests through the Orchestrator to specialized agents.
     """
     logger.info(f"Processing query: '{request.query}'")
+    trace = current_trace()
+    if trace is not None:
+        trace.query = request.query
 
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="The 'query' field cannot be empty.")
 
+    if request.format != "text":
+        return _handle_raw_query(request)
+
     try:
         # Pass request to the Orchestrator
         # The Orchestrator will use your team's IDs if the request fields are None
@@ -76,13 +133,82 @@ async def handle_query(request: QueryRequest):
             detail="The AI encountered an issue processing your data. Please check your credentials.json."
         )
 
+def _handle_raw_query(request: QueryRequest):
+    """Returns the validated plan and raw rows without any summarization LLM calls."""
+    try:
+        payload = orchestrator.route_and_fetch(
+            query=request.query,
+            property_id=request.propertyId,
+            spreadsheet_id=request.spreadsheetId
+        )
+        with trace_stage(f"encode_{request.format}"):
+            if request.format == "columnar":
+                return QueryResponse(response=f"Raw {payload['intent']} data.", data=encode_columnar(payload))
+            if request.format == "ndjson":
+                return Response(content=encode_ndjson(payload), media_type=MEDIA_TYPES["ndjson"])
+            return Response(content=encode_arrow(payload), media_type=MEDIA_TYPES["arrow"])
+
+    except ValueError as ve:
+        # Plan validation failures and unsupported format/intent combinations
+        raise HTTPException(status_code=422, detail=str(ve))
+    except RuntimeError as rte:
+        # Optional encoder dependency (pyarrow) not installed
+        raise HTTPException(status_code=501, detail=str(rte))
+    except Exception as e:
+        logger.error(f"Raw Data Error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500, 
+            detail="The AI encountered an issue fetching your data. Please check your credentials.json."
+        )
+
+# --- Admin / Profiling Endpoints ---
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is configured."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Constant-time comparison so the token can't be recovered from response timing
+    if not hmac.compare_digest((x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.get("/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def get_slow_requests(limit: int = 10):
+    """Slowest recent requests over SLOW_REQUEST_THRESHOLD with stage timeline, payload sizes and retries."""
+    return {"threshold_seconds": slow_requests.threshold_seconds, "requests": slow_requests.slowest(limit)}
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profile(seconds: int = 30):
+    """
+    Starts a sampling-profiler window of at most PROFILER_MAX_SECONDS.
+    Only the worker that receives this request is sampled; its pid is in the status.
+    """
+    seconds = max(1, min(seconds, settings.PROFILER_MAX_SECONDS))
+    if not profiler.start(seconds):
+        raise HTTPException(status_code=409, detail="A profiling window is already running.")
+    return profiler.status()
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def get_profile(output: Literal["status", "folded"] = "status"):
+    """Status of the latest window (from any worker), or its collapsed stacks ('folded') for flamegraph.pl / speedscope."""
+    snapshot = profiler.snapshot()
+    if output == "folded":
+        return PlainTextResponse(snapshot["folded"])
+    return snapshot["status"]
+
+@app.delete("/admin/profile", dependencies=[Depends(require_admin)])
+async def stop_profile():
+    """Stops the window if this worker runs it; a window on another worker ends at its ends_at."""
+    profiler.stop()
+    return profiler.snapshot()["status"]
+
 # --- Server Lifecycle ---
 if __name__ == "__main__":
     # MANDATORY: Application must bind only to port 8080
     logger.info(f"Starting Spike AI Server on {settings.HOST}:{settings.PORT}")
+    # WORKERS > 1 forks independent processes that share the SQLite cache tier
     uvicorn.run(
         "api.server:app", 
         host=settings.HOST, 
         port=settings.PORT, 
+        workers=settings.WORKERS,
         reload=False 
     )
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+core/cache.py - Thread-safe in-process TTL cache for crawl snapshots and GA4 reports.
+Optionally backed by a SharedStore (core/shared_cache.py) so multiple workers share
+entries and the lookup counts used to pick hot keys.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from core.shared_cache import SharedStore
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 256, history_size: int = 1000, shared=None):
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # key -> [lock, callers]; dropped once the last caller for the key finishes
+        self._key_locks = {}
+        # Recent (timestamp, key) lookups, used by the prefetch scheduler to learn hot keys
+        self._history = deque(maxlen=history_size)
+        # Per-worker lookup counts, kept apart from entries so reading them never unpickles cached values
+        self._shared_history = SharedStore(shared.path, f"{shared.namespace}:hot_keys") if shared else None
+
+    def get(self, key):
+        """Returns the cached value, or None if missing or expired."""
+        with self._lock:
+            self._history.append((time.monotonic(), key))
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+        return self._get_shared(key)
+
+    def set(self, key, value):
+        self._set_local(key, value, time.monotonic() + self.ttl_seconds)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, time.time() + self.ttl_seconds)
+            except Exception as e:
+                print(f"Shared cache write failed: {e}")
+
+    def _set_local(self, key, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        """Falls back to the cross-worker tier and promotes hits into local memory."""
+        if self.shared is None:
+            return None
+        try:
+            hit = self.shared.get(key)
+        except Exception as e:
+            print(f"Shared cache read failed: {e}")
+            return None
+        if hit is None:
+            return None
+        expires_at, value = hit
+        self._set_local(key, value, time.monotonic() + (expires_at - time.time()))
+        return value
+
+    def ttl_remaining(self, key):
+        """Seconds until the entry expires, or None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return max(entry[0] - time.monotonic(), 0.0)
+        if self.shared is not None:
+            try:
+                expires_at = self.shared.expires_at(key)
+            except Exception:
+                return None
+            if expires_at is not None:
+                return max(expires_at - time.time(), 0.0)
+        return None
+
+    def get_or_load(self, key, loader, refresh: bool = False, cache_if=None):
+        """
+        Returns the cached value or calls loader() to fill it.
+        Concurrent callers for the same key share a single load.
+        cache_if(value) decides whether a loaded value is stored (e.g. skip error payloads).
+        """
+        if not refresh:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                # Another caller may have filled the entry while we waited
+                if not refresh:
+                    with self._lock:
+                        entry = self._entries.get(key)
+                    if entry is not None and entry[0] > time.monotonic():
+                        return entry[1]
+                    value = self._get_shared(key)
+                    if value is not None:
+                        return value
+                value = loader()
+                if value is not None and (cache_if is None or cache_if(value)):
+                    self.set(key, value)
+                return value
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if key_lock[1] == 0:
+                    del self._key_locks[key]
+
+    def _recent_counts(self, window_seconds: float) -> Counter:
+        cutoff = time.monotonic() - window_seconds
+        with self._lock:
+            return Counter(key for seen_at, key in self._history if seen_at >= cutoff)
+
+    def publish_hot_keys(self, window_seconds: float, ttl_seconds: float):
+        """
+        Shares this worker's recent lookup counts so the worker that prefetches
+        learns from every worker's traffic; entries of dead workers expire after ttl_seconds.
+        """
+        if self._shared_history is None:
+            return
+        try:
+            self._shared_history.set(
+                os.getpid(),
+                {"pid": os.getpid(), "counts": self._recent_counts(window_seconds)},
+                time.time() + ttl_seconds
+            )
+        except Exception as e:
+            print(f"Hot key publish failed: {e}")
+
+    def hot_keys(self, n: int, window_seconds: float):
+        """The n most frequently requested keys among lookups in the last window_seconds, across workers."""
+        counts = self._recent_counts(window_seconds)
+        if self._shared_history is not None:
+            try:
+                published = self._shared_history.values()
+            except Exception as e:
+                print(f"Shared hot key read failed: {e}")
+                published = []
+            for worker in published:
+                # Our own published counts are older than the local history just counted
+                if worker["pid"] != os.getpid():
+                    counts.update(worker["counts"])
+        return [key for key, _ in counts.most_common(n)]
@@ -1,4 +1,5 @@
 import os
+from typing import List, Dict, Any
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -10,6 +11,29 @@ class Settings(BaseSettings):
     MODEL_NAME: str = os.getenv("MODEL_NAME", "gemini-1.5-flash") # Fixed from 2.5 to 1.5
     LITELLM_BASE_URL: str = os.getenv("LITELLM_BASE_URL", "http://3.110.18.218")
 
+    # Per-stage model profiles (core/llm.py). Fast/strong default to MODEL_NAME until configured.
+    FAST_MODEL_NAME: str = os.getenv("FAST_MODEL_NAME", MODEL_NAME)
+    STRONG_MODEL_NAME: str = os.getenv("STRONG_MODEL_NAME", MODEL_NAME)
+    MODEL_PROFILES: Dict[str, Dict[str, Any]] = {
+        "fast": {"model": FAST_MODEL_NAME, "temperature": 0.0},  # Deterministic structured output
+        "standard": {"model": MODEL_NAME, "temperature": 0.7},
+        "strong": {"model": STRONG_MODEL_NAME, "temperature": 0.7}
+    }
+    # Profiles tried in order for each stage; later entries are fallbacks
+    STAGE_PROFILES: Dict[str, List[str]] = {
+        "intent": ["fast", "standard"],
+        "planning": ["fast", "standard"],
+        "summary": ["standard", "fast"],
+        "synthesis": ["strong", "standard"]
+    }
+    # A profile whose median latency (seconds) exceeds its stage budget is skipped while degraded
+    STAGE_LATENCY_BUDGETS: Dict[str, float] = {
+        "intent": 3.0, "planning": 5.0, "summary": 15.0, "synthesis": 20.0
+    }
+    MODEL_ERROR_RATE_THRESHOLD: float = 0.5
+    MODEL_HEALTH_WINDOW: int = 300  # Seconds of call history used for health decisions
+    MODEL_CALL_TIMEOUT: float = 30.0
+
     # Your Specific Data Identifiers
     DEFAULT_GA4_PROPERTY_ID: str = "516810413"
     DEFAULT_SHEET_ID: str = "1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"
@@ -17,8 +41,65 @@ class Settings(BaseSettings):
     # Path to the credentials file you just added to root
     GOOGLE_APPLICATION_CREDENTIALS: str = os.path.join(os.getcwd(), "credentials.json")
 
+    # Google API transport (services/google_transport.py): "requests" or "httpx" (HTTP/2, optional dependency)
+    GOOGLE_HTTP_BACKEND: str = "requests"
+    GOOGLE_HTTP_POOL_SIZE: int = 10
+    GOOGLE_HTTP_TIMEOUT: float = 60.0
+    GOOGLE_HTTP_CHUNK_SIZE: int = 65536
+    GA4_REPORT_PAGE_SIZE: int = 100000  # runReport rows per page (API maximum 250000)
+
     # Server Config
     PORT: int = 8080
     HOST: str = "0.0.0.0"
+    WORKERS: int = 1  # >1 runs multiple uvicorn processes sharing the SQLite cache tier
+
+    # Private (0700) directory for local SQLite state; never point this at a shared dir like /tmp
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.getcwd(), ".spikeai"))
+
+    # Cross-worker cache (always on when WORKERS > 1)
+    SHARED_CACHE_ENABLED: bool = False
+    SHARED_CACHE_PATH: str = os.path.join(DATA_DIR, "cache.sqlite3")
+
+    # Admin / profiling endpoints (disabled while ADMIN_TOKEN is empty)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    SLOW_REQUEST_THRESHOLD: float = 5.0  # Seconds; slower requests keep their full timeline
+    SLOW_REQUEST_BUFFER: int = 50
+    SLOW_REQUEST_RETENTION: int = 3600  # Seconds captured traces stay in the shared tier
+    PROFILER_MAX_SECONDS: int = 120
+    PROFILER_INTERVAL: float = 0.01
+
+    # Overlap the crawl load and GA4 planning with intent detection (orchestrator/router.py)
+    SPECULATIVE_EXECUTION: bool = True
+    SPECULATIVE_MAX_WORKERS: int = 4
+
+    # Cache TTLs (seconds)
+    SHEETS_CACHE_TTL: int = 900
+    GA4_CACHE_TTL: int = 600
+
+    # Background prefetch / cache warming
+    PREFETCH_ENABLED: bool = True
+    PREFETCH_INTERVAL: int = 60  # Seconds between scheduler passes
+    PREFETCH_REFRESH_MARGIN: int = 120  # Refresh entries expiring within this window
+    PREFETCH_MAX_WORKERS: int = 2
+    PREFETCH_HOT_KEYS: int = 5  # Learned keys per cache to keep warm
+    PREFETCH_HOT_WINDOW: int = 1800  # Only lookups this recent (seconds) count towards hot keys
+    PREFETCH_GA4_QUOTA_PER_MIN: int = 10  # Max background GA4 reports per minute
+    PREFETCH_SHEET_IDS: List[str] = ["1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"]
+    PREFETCH_GA4_QUERIES: List[str] = []  # NL template queries, e.g. "daily users for the past week"
+
+    # Local GA4 daily rollups (services/ga4_rollups.py)
+    ROLLUP_ENABLED: bool = True
+    ROLLUP_DB_PATH: str = os.path.join(DATA_DIR, "ga4_rollups.sqlite3")
+    ROLLUP_PROPERTY_IDS: List[str] = ["516810413"]
+    ROLLUP_SPECS: List[Dict[str, List[str]]] = [
+        {"metrics": ["activeUsers", "sessions", "screenPageViews"], "dimensions": ["date"]},
+        {"metrics": ["sessions", "screenPageViews"], "dimensions": ["date", "pagePath"]},
+        {"metrics": ["activeUsers", "sessions"], "dimensions": ["date", "sessionSource"]}
+    ]
+    ROLLUP_BACKFILL_DAYS: int = 90  # History fetched on first sync
+    ROLLUP_SETTLING_DAYS: int = 3  # Recent days re-fetched every sync while GA4 finalizes them
+    ROLLUP_SYNC_CHUNK_DAYS: int = 7  # Days per runReport call, keeping each response small
+    ROLLUP_SYNC_INTERVAL: int = 3600
+    ROLLUP_RETRY_INTERVAL: int = 600  # Seconds before a spec whose sync failed is retried
 
 settings = Settings()
\ No newline at end of file
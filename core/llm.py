@@ -0,0 +1,88 @@
+"""
+core/llm.py - Per-stage model profiles with latency- and error-aware fallback.
+
+Every LLM call names its stage (intent, planning, summary, synthesis). The stage
+maps to an ordered list of profiles in Settings; profiles that have recently been
+slow or failing for that stage are tried last, and a profile that still fails
+after its retries falls over to the next one.
+"""
+import json
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from openai import RateLimitError, APIError
+from core.config import settings
+from core.profiling import trace_stage, record_payload, record_retry
+
+# (stage, profile) -> deque of (timestamp, latency_seconds, ok)
+_health = defaultdict(lambda: deque(maxlen=50))
+_health_lock = threading.Lock()
+
+MIN_SAMPLES = 5
+
+
+def _record(stage: str, profile: str, latency: float, ok: bool):
+    with _health_lock:
+        _health[(stage, profile)].append((time.time(), latency, ok))
+
+
+def is_degraded(stage: str, profile: str) -> bool:
+    cutoff = time.time() - settings.MODEL_HEALTH_WINDOW
+    with _health_lock:
+        samples = [s for s in _health[(stage, profile)] if s[0] >= cutoff]
+    if len(samples) < MIN_SAMPLES:
+        return False
+    error_rate = sum(1 for s in samples if not s[2]) / len(samples)
+    if error_rate > settings.MODEL_ERROR_RATE_THRESHOLD:
+        return True
+    latencies = [s[1] for s in samples if s[2]]
+    budget = settings.STAGE_LATENCY_BUDGETS.get(stage)
+    return bool(latencies) and budget is not None and statistics.median(latencies) > budget
+
+
+def stage_profiles(stage: str):
+    """Configured profiles for the stage, healthy ones first (order otherwise preserved)."""
+    names = settings.STAGE_PROFILES.get(stage, ["standard"])
+    return sorted(names, key=lambda name: is_degraded(stage, name))
+
+
+def call_with_fallback(client, stage: str, messages, response_format=None, max_retries: int = 3, log_prefix: str = ""):
+    """
+    Exponential backoff per profile, then falls over to the stage's next profile.
+    Raises the last error if every profile fails.
+    """
+    record_payload(f"llm_{stage}_prompt_bytes", len(json.dumps(messages)))
+    with trace_stage(f"llm:{stage}"):
+        return _call_profiles(client, stage, messages, response_format, max_retries, log_prefix)
+
+
+def _call_profiles(client, stage, messages, response_format, max_retries, log_prefix):
+    last_error = None
+    for name in stage_profiles(stage):
+        profile = settings.MODEL_PROFILES[name]
+        for attempt in range(max_retries):
+            request = {
+                "model": profile["model"],
+                "messages": messages,
+                "temperature": profile["temperature"],
+                "timeout": settings.MODEL_CALL_TIMEOUT
+            }
+            if response_format is not None:
+                request["response_format"] = response_format
+            started = time.perf_counter()
+            try:
+                response = client.chat.completions.create(**request)
+                _record(stage, name, time.perf_counter() - started, True)
+                return response
+            except (RateLimitError, APIError) as e:
+                _record(stage, name, time.perf_counter() - started, False)
+                record_retry(stage, name, attempt, e)
+                last_error = e
+                if attempt == max_retries - 1:
+                    break
+                wait = (2 ** attempt) + 1
+                print(f"{log_prefix}Rate limit hit on '{name}' profile. Retrying in {wait}s...")
+                time.sleep(wait)
+        print(f"{log_prefix}Model profile '{name}' failed for {stage}; trying next profile.")
+    raise last_error
@@ -0,0 +1,253 @@
+"""
+core/profiling.py - Request stage timelines, slow-request capture and an on-demand sampling profiler.
+
+Stage timing is opt-in per request: the API middleware starts a RequestTrace and
+code anywhere below it marks stages with `with trace_stage("name"):`. Outside a
+request (e.g. prefetch threads) every helper is a no-op.
+
+With several workers, pass a SharedStore so captured traces and profiler output
+are readable from whichever worker serves the admin request.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+    def __init__(self, path: str, query: str = None):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.query = query
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+        self.stages = []  # {"stage", "start_ms", "duration_ms"}
+        self.payloads = {}  # name -> bytes / rows
+        self.retries = []  # {"stage", "profile", "attempt", "error"}
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def finish(self):
+        self.duration = self.elapsed_ms() / 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "path": self.path,
+            "query": self.query,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0) * 1000, 1),
+            "stages": self.stages,
+            "payloads": self.payloads,
+            "retries": self.retries
+        }
+
+
+def start_trace(path: str, query: str = None):
+    trace = RequestTrace(path, query)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Records the wall time of a pipeline stage on the current request, if any."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = trace.elapsed_ms()
+    try:
+        yield
+    finally:
+        trace.stages.append({
+            "stage": name,
+            "start_ms": round(start, 1),
+            "duration_ms": round(trace.elapsed_ms() - start, 1)
+        })
+
+
+def record_payload(name: str, size: int):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.payloads[name] = trace.payloads.get(name, 0) + size
+
+
+def record_retry(stage: str, profile: str, attempt: int, error: Exception):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.retries.append({
+            "stage": stage, "profile": profile, "attempt": attempt,
+            "error": f"{type(error).__name__}: {error}"[:200]
+        })
+
+
+class SlowRequestLog:
+    """Ring buffer of recent requests slower than the threshold; mirrored to `shared` across workers."""
+
+    def __init__(self, threshold_seconds: float, capacity: int, shared=None, retention_seconds: float = 3600):
+        self.threshold_seconds = threshold_seconds
+        self.capacity = capacity
+        self.shared = shared
+        self.retention_seconds = retention_seconds
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def maybe_capture(self, trace: RequestTrace):
+        if trace.duration is None or trace.duration < self.threshold_seconds:
+            return
+        entry = trace.to_dict()
+        entry["pid"] = os.getpid()
+        with self._lock:
+            self._entries.append(entry)
+        if self.shared is not None:
+            try:
+                self.shared.set(trace.request_id, entry, time.time() + self.retention_seconds)
+            except Exception as e:
+                print(f"Slow request capture failed: {e}")
+
+    def slowest(self, limit: int = None):
+        with self._lock:
+            entries = list(self._entries)
+        if self.shared is not None:
+            try:
+                # Every worker's captures; keep the most recent `capacity` like the local buffer
+                entries = sorted(self.shared.values(), key=lambda e: e["started_at"])[-self.capacity:]
+            except Exception as e:
+                print(f"Shared slow request read failed: {e}")
+        entries = sorted(entries, key=lambda e: e["duration_ms"], reverse=True)
+        return entries[:limit] if limit else entries
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack at a fixed interval for a bounded window.
+    Output is the collapsed-stack ("folded") format read by flamegraph.pl and speedscope.
+
+    Only the process that starts a window is sampled. With `shared`, one window
+    runs at a time across workers and its output is published so snapshot()
+    returns it from any worker.
+    """
+
+    LEASE_NAME = "sampling-profiler"
+    PUBLISH_INTERVAL = 1.0  # Seconds between publishes of in-progress output
+    PUBLISH_TTL = 3600
+
+    def __init__(self, interval_seconds: float = 0.01, shared=None):
+        self.interval_seconds = interval_seconds
+        self.shared = shared
+        self._counts = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.ends_at = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float) -> bool:
+        """Starts a profiling window; False if one is already running (here or on another worker)."""
+        with self._lock:
+            if self.running:
+                return False
+            if self.shared is not None and not self.shared.try_acquire_lease(self.LEASE_NAME, seconds + 5):
+                return False
+            self._counts = Counter()
+            self.samples = 0
+            self._stop.clear()
+            self.started_at = time.time()
+            self.ends_at = self.started_at + seconds
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Ends this worker's window early; a window running on another worker ends at ends_at."""
+        self._stop.set()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        published_at = time.monotonic()
+        try:
+            while not self._stop.is_set() and time.time() < self.ends_at:
+                stacks = []
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    names = []
+                    # Walk leaf -> root without touching source lines (linecache is too slow here)
+                    while frame is not None:
+                        code = frame.f_code
+                        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stacks.append(";".join(reversed(names)))
+                with self._lock:
+                    self._counts.update(stacks)
+                    self.samples += 1
+                if time.monotonic() - published_at >= self.PUBLISH_INTERVAL:
+                    self._publish(running=True)
+                    published_at = time.monotonic()
+                self._stop.wait(self.interval_seconds)
+        finally:
+            self._publish(running=False)
+            if self.shared is not None:
+                try:
+                    self.shared.release_lease(self.LEASE_NAME)
+                except Exception as e:
+                    print(f"Profiler lease release failed: {e}")
+
+    def _publish(self, running: bool):
+        if self.shared is None:
+            return
+        status = {**self.status(), "running": running}
+        try:
+            self.shared.set("latest", {"status": status, "folded": self.folded()}, time.time() + self.PUBLISH_TTL)
+        except Exception as e:
+            print(f"Profiler publish failed: {e}")
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "ends_at": self.ends_at,
+            "samples": self.samples,
+            "interval_seconds": self.interval_seconds
+        }
+
+    def folded(self) -> str:
+        with self._lock:
+            counts = self._counts.most_common()
+        return "\n".join(f"{stack} {count}" for stack, count in counts) + "\n"
+
+    def snapshot(self) -> dict:
+        """{"status", "folded"} of the most recent window, whichever worker ran it."""
+        local = {"status": self.status(), "folded": self.folded()}
+        if self.shared is None or self.running:
+            return local
+        try:
+            hit = self.shared.get("latest")
+        except Exception as e:
+            print(f"Shared profile read failed: {e}")
+            return local
+        if hit is not None and (self.started_at is None or hit[1]["status"]["started_at"] > self.started_at):
+            return hit[1]
+        return local
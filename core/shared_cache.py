@@ -0,0 +1,170 @@
+"""
+core/shared_cache.py - SQLite (WAL) cache tier shared by all uvicorn workers on a host.
+
+No external service is needed: every worker opens the same database file, so a
+crawl or GA4 report fetched by one worker is served to the others. Values are
+pickled (DataFrames keep their columnar numpy buffers). Unpickling runs code, so
+the database must only be writable by the server user: private_db_path keeps it
+in an owner-only directory and refuses files or directories owned by anyone else.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+from core.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+# Windows reports every writable file as 0o666 and has no uids; file ACLs are left to the deployment there
+_POSIX_PERMISSIONS = os.name != "nt"
+
+
+def _check_private(path: str, st, kind: str):
+    if not _POSIX_PERMISSIONS:
+        return
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"Refusing to use {path}: owned by uid {st.st_uid}, not the server user.")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"Refusing to use {path}: the {kind} must be writable only by its owner.")
+
+
+def private_db_path(path: str) -> str:
+    """
+    Prepares a SQLite file that only the current user can write.
+    The parent directory is created 0700; on POSIX an existing directory or file
+    owned by another user or writable by group/others raises PermissionError,
+    as does a symlink anywhere.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if stat.S_ISLNK(st.st_mode):
+        raise PermissionError(f"Refusing to use {directory}: it must be a directory, not a symlink.")
+    _check_private(directory, st, "directory")
+
+    try:
+        # Create the file owner-only before SQLite opens it with the default umask
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise PermissionError(f"Refusing to use {path}: it must be a regular file.")
+    _check_private(path, st, "file")
+    return path
+
+
+class SharedStore:
+    def __init__(self, path: str, namespace: str):
+        self.path = private_db_path(path)
+        self.namespace = namespace
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode_key(key) -> str:
+        return json.dumps(key, sort_keys=True, default=str)
+
+    def get(self, key):
+        """Returns (expires_at, value) using wall-clock time, or None if missing or expired."""
+        row = self._conn().execute(
+            "SELECT expires_at, value FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._encode_key(key))
+        ).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0], pickle.loads(row[1])
+
+    def expires_at(self, key):
+        """Wall-clock expiry of a live entry without unpickling it, or None."""
+        row = self._conn().execute(
+            "SELECT expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._encode_key(key))
+        ).fetchone()
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, expires_at: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (self.namespace, self._encode_key(key), expires_at,
+             pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        )
+
+    def values(self) -> list:
+        """Every live value in this namespace, in no particular order."""
+        rows = self._conn().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time())
+        ).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def purge_expired(self):
+        self._conn().execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def try_acquire_lease(self, name: str, ttl_seconds: float) -> bool:
+        """
+        Cross-process leader election: True if this process holds (or just took)
+        the named lease. Used so only one worker runs background jobs.
+        """
+        owner = str(os.getpid())
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + ttl_seconds)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release_lease(self, name: str):
+        """Gives up the named lease if this process holds it."""
+        self._conn().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, str(os.getpid())))
+
+
+def shared_cache_enabled() -> bool:
+    return settings.SHARED_CACHE_ENABLED or settings.WORKERS > 1
+
+
+def shared_store(namespace: str):
+    """Returns a SharedStore for the namespace, or None when running single-process."""
+    if not shared_cache_enabled():
+        return None
+    return SharedStore(settings.SHARED_CACHE_PATH, namespace)
@@ -17,6 +17,8 @@ fi
 export TMPDIR="$TEMP_DIR"
 export PYTHONPATH=$PYTHONPATH:.
 export GOOGLE_APPLICATION_CREDENTIALS="$PROJECT_DIR/credentials.json"
+# Number of uvicorn worker processes; >1 enables the shared SQLite cache tier
+export WORKERS="${WORKERS:-1}"
 
 # 3. Virtual Environment Setup
 if [ ! -d "$VENV_DIR" ]; then
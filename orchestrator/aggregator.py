@@ -1,7 +1,7 @@
 import json
-import time
-from openai import OpenAI, RateLimitError, APIError
+from openai import OpenAI
 from core.config import settings
+from core.llm import call_with_fallback
 
 class Aggregator:
     def __init__(self):
@@ -34,7 +34,7 @@ class Aggregator:
         """
 
         try:
-            # Final synthesis with specific temperature for factual accuracy
+            # Final synthesis on the 'synthesis' stage profiles (strongest model first)
             response = self._call_gemini_with_backoff(
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -47,15 +47,4 @@ class Aggregator:
 
     def _call_gemini_with_backoff(self, messages):
         """Exponential backoff to handle proxy rate limits."""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                return self.client.chat.completions.create(
-                    model=settings.MODEL_NAME,
-                    messages=messages,
-                    temperature=0.7 
-                )
-            except (RateLimitError, APIError) as e:
-                if attempt == max_retries - 1: raise e
-                wait = (2 ** attempt) + 1
-                time.sleep(wait)
\ No newline at end of file
+        return call_with_fallback(self.client, "synthesis", messages, max_retries=3)
\ No newline at end of file
@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import List, Dict
 from openai import OpenAI
 from core.config import settings
+from core.llm import call_with_fallback
 
 class Planner:
     def __init__(self):
@@ -62,14 +63,16 @@ class Planner:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=settings.MODEL_NAME,
+            response = call_with_fallback(
+                self.client,
+                "planning",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": f"Today is {today}. Query: {query}"}
                 ],
                 # Force structured output using your schema
-                response_format={"type": "json_object", "response_schema": response_schema}
+                response_format={"type": "json_object", "response_schema": response_schema},
+                max_retries=1
             )
             
             return json.loads(response.choices[0].message.content)
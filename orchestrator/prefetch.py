@@ -0,0 +1,166 @@
+"""
+orchestrator/prefetch.py - Background cache warming for hot crawls and GA4 reports.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from core.config import settings
+from core.shared_cache import shared_store
+from tools.ga4_templates import build_plan_from_template
+from tools.ga4_plan_compiler import compile_reporting_plan, plan_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Back off background GA4 traffic for this long after a quota/rate-limit error
+QUOTA_COOLDOWN_SECONDS = 300
+
+
+class PrefetchScheduler:
+    """
+    Keeps hot Sheets crawls and GA4 reports warm so interactive requests hit cache.
+    Candidates come from the config lists in Settings plus the most requested
+    keys in each cache; entries are refreshed shortly before their TTL expires.
+    """
+
+    def __init__(self, orchestrator):
+        self.seo_agent = orchestrator.seo_agent
+        self.analytics_agent = orchestrator.analytics_agent
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.PREFETCH_MAX_WORKERS,
+            thread_name_prefix="prefetch"
+        )
+        self._stop = threading.Event()
+        self._thread = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        # Timestamps of background GA4 reports in the last minute
+        self._ga4_calls = deque()
+        self._ga4_paused_until = 0.0
+        # With several workers only the lease holder prefetches; the rest read the shared tier
+        self._leases = shared_store("prefetch")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Prefetch scheduler started.")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning(f"Prefetch pass failed: {e}")
+            self._stop.wait(settings.PREFETCH_INTERVAL)
+
+    def run_once(self):
+        """Schedules a refresh for every candidate that is cold or about to expire."""
+        # Every worker shares its lookups; only the lease holder acts on them
+        for cache in (self.seo_agent.crawl_cache, self.analytics_agent.report_cache):
+            cache.publish_hot_keys(settings.PREFETCH_HOT_WINDOW, settings.PREFETCH_INTERVAL * 3)
+        if self._leases is not None and not self._leases.try_acquire_lease(
+                "prefetch-scheduler", settings.PREFETCH_INTERVAL * 3):
+            return
+        if self._leases is not None:
+            self._leases.purge_expired()
+
+        if self.analytics_agent.rollup_store is not None:
+            for pid in settings.ROLLUP_PROPERTY_IDS:
+                # Quota is charged per runReport chunk inside the sync
+                if self.analytics_agent.rollup_store.sync_due(pid):
+                    self._submit(("rollups", pid), self._sync_rollups, pid)
+
+        for sid in self._sheet_candidates():
+            if self._needs_refresh(self.seo_agent.crawl_cache, sid):
+                self._submit(("sheets", sid), self._refresh_crawl, sid)
+
+        for key in self._report_candidates():
+            if not self._needs_refresh(self.analytics_agent.report_cache, key):
+                continue
+            if not self._acquire_ga4_quota():
+                break
+            self._submit(("ga4", key), self._refresh_report, key)
+
+    # --- Candidate selection ---
+    def _sheet_candidates(self):
+        hot = self.seo_agent.crawl_cache.hot_keys(settings.PREFETCH_HOT_KEYS, settings.PREFETCH_HOT_WINDOW)
+        return list(dict.fromkeys(settings.PREFETCH_SHEET_IDS + hot))
+
+    def _report_candidates(self):
+        configured = []
+        # Template queries are re-resolved each pass so relative dates keep rolling
+        for query in settings.PREFETCH_GA4_QUERIES:
+            plan = build_plan_from_template(query)
+            if plan is None:
+                logger.warning(f"Prefetch query doesn't match a GA4 template: '{query}'")
+                continue
+            configured.append((settings.DEFAULT_GA4_PROPERTY_ID, plan_cache_key(compile_reporting_plan(plan))))
+        hot = self.analytics_agent.report_cache.hot_keys(settings.PREFETCH_HOT_KEYS, settings.PREFETCH_HOT_WINDOW)
+        return list(dict.fromkeys(configured + hot))
+
+    def _needs_refresh(self, cache, key):
+        remaining = cache.ttl_remaining(key)
+        return remaining is None or remaining < settings.PREFETCH_REFRESH_MARGIN
+
+    # --- Execution ---
+    def _submit(self, task_key, fn, arg):
+        with self._lock:
+            if task_key in self._in_flight:
+                return
+            self._in_flight.add(task_key)
+
+        def task():
+            try:
+                fn(arg)
+            except Exception as e:
+                logger.warning(f"Prefetch of {task_key[0]} failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(task_key)
+
+        self._executor.submit(task)
+
+    def _refresh_crawl(self, sid):
+        self.seo_agent.load_crawl(sid, refresh=True)
+
+    def _sync_rollups(self, pid):
+        error = self.analytics_agent.rollup_store.sync(
+            pid, self.analytics_agent._fetch_report, acquire=self._acquire_ga4_quota
+        )
+        if error is not None:
+            self._note_ga4_error(error)
+
+    def _refresh_report(self, key):
+        pid, plan_json = key
+        result = self.analytics_agent.run_report(pid, json.loads(plan_json), refresh=True)
+        if isinstance(result, dict) and "error" in result:
+            self._note_ga4_error(result["error"])
+
+    def _note_ga4_error(self, error):
+        error = str(error).lower()
+        if "quota" in error or "429" in error or "resource_exhausted" in error:
+            self._ga4_paused_until = time.monotonic() + QUOTA_COOLDOWN_SECONDS
+            logger.warning("GA4 quota pressure detected; pausing background reports.")
+
+    def _acquire_ga4_quota(self):
+        """Sliding one-minute budget for background GA4 reports."""
+        now = time.monotonic()
+        if now < self._ga4_paused_until:
+            return False
+        with self._lock:
+            while self._ga4_calls and now - self._ga4_calls[0] > 60:
+                self._ga4_calls.popleft()
+            if len(self._ga4_calls) >= settings.PREFETCH_GA4_QUOTA_PER_MIN:
+                return False
+            self._ga4_calls.append(now)
+        return True
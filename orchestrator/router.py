@@ -1,12 +1,36 @@
 import json
-import time
-from openai import OpenAI, RateLimitError, APIError
+import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI
 from core.config import settings
+from core.llm import call_with_fallback
 from core.prompts import ORCHESTRATOR_ROUTER_PROMPT
 from agents.analytics_agent import AnalyticsAgent
 from agents.seo_agent import SEOAgent
 from orchestrator.planner import Planner
 from orchestrator.aggregator import Aggregator
+from tools.ga4_tools import METRIC_SYNONYMS
+from tools.ga4_templates import build_plan_from_template
+
+# Crawl/audit vocabulary: queries using it may route to SEO or both
+SEO_TERMS_RE = re.compile(
+    r"\b(seo|crawl\w*|audit\w*|screaming frog|index(?:able|ability|ed|ing)?|noindex|status codes?|"
+    r"redirect\w*|404s?|broken|title tags?|meta|descriptions?|h1s?|headings?|canonical\w*)\b"
+)
+_METRIC_TERMS_RE = re.compile(
+    r"\b(" + "|".join(re.escape(p) for p in sorted(METRIC_SYNONYMS, key=len, reverse=True)) + r")\b"
+)
+
+
+def _worth_speculative_planning(query: str) -> bool:
+    """
+    Cheap pre-check before spending an LLM planner call on speculation.
+    Only analytics-only routes reuse the plan ("both" re-plans each sub-task), so
+    the query must name a GA4 metric and no crawl/audit terms.
+    """
+    text = query.lower()
+    return bool(_METRIC_TERMS_RE.search(text)) and not SEO_TERMS_RE.search(text)
 
 class Orchestrator:
     def __init__(self):
@@ -24,21 +48,21 @@ class Orchestrator:
         self.planner = Planner()
         self.aggregator = Aggregator()
 
+        # Speculative data fetching overlapped with intent detection
+        self._speculation_pool = ThreadPoolExecutor(
+            max_workers=settings.SPECULATIVE_MAX_WORKERS,
+            thread_name_prefix="speculative"
+        )
+
     def _call_gemini_with_backoff(self, messages):
         """
         Internal backoff for the router to handle high concurrency during the hackathon.
         """
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                return self.client.chat.completions.create(
-                    model=settings.MODEL_NAME,
-                    messages=messages,
-                    response_format={"type": "json_object"}
-                )
-            except (RateLimitError, APIError):
-                if attempt == max_retries - 1: raise
-                time.sleep((2 ** attempt) + 1)
+        return call_with_fallback(
+            self.client, "intent", messages,
+            response_format={"type": "json_object"},
+            max_retries=3
+        )
 
     def route_and_execute(self, query: str, property_id: str = None, spreadsheet_id: str = None):
         """
@@ -49,9 +73,13 @@ class Orchestrator:
         sid = spreadsheet_id if spreadsheet_id else "1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"
 
         try:
+            # 0. Start route-independent data loads while the router LLM decides
+            speculative = self._start_speculation(query, sid)
+
             # 1. Intent Detection
             intent_data = self._get_intent(query)
             intent = intent_data.get("intent", "analytics")
+            self._settle_speculation(speculative, intent)
             
             # 2. Tier 3: Multi-Agent Fusion
             if intent == "both":
@@ -68,6 +96,51 @@ class Orchestrator:
         except Exception as e:
             return f"Orchestration Error: {str(e)}"
 
+    def route_and_fetch(self, query: str, property_id: str = None, spreadsheet_id: str = None):
+        """
+        Raw data mode for machine consumers: same routing as route_and_execute,
+        but returns plans and rows without any summarization or synthesis calls.
+        """
+        pid = property_id if property_id else "516810413"
+        sid = spreadsheet_id if spreadsheet_id else "1zzf4ax_H2WiTBVrJigGjF2Q3Yz-qy2qMCbAMKvl6VEE"
+
+        speculative = self._start_speculation(query, sid)
+        intent = self._get_intent(query).get("intent", "analytics")
+        self._settle_speculation(speculative, intent)
+        results = {}
+        if intent in ("analytics", "both"):
+            results["analytics"] = self.analytics_agent.fetch_data(query, pid)
+        if intent in ("seo", "both"):
+            results["seo"] = self.seo_agent.fetch_data(sid)
+        return {"intent": intent, "results": results}
+
+    def _start_speculation(self, query: str, sid: str):
+        """
+        Kicks off the crawl load and, for likely analytics-only queries, GA4 plan
+        generation concurrently with intent detection. Both go through the agents'
+        single-flight caches, so the chosen route either finds the result cached or
+        joins the in-flight load instead of repeating it.
+        """
+        if not settings.SPECULATIVE_EXECUTION:
+            return {}
+
+        def submit(fn, *args):
+            # Copy the context so speculative stages show up in the request's trace
+            return self._speculation_pool.submit(contextvars.copy_context().run, fn, *args)
+
+        speculative = {"seo": submit(self.seo_agent.load_crawl, sid)}
+        # Template plans are built inline for free; only speculate the LLM planner call,
+        # and only when it's likely to be used, since it competes with the router call
+        if build_plan_from_template(query) is None and _worth_speculative_planning(query):
+            speculative["analytics"] = submit(self.analytics_agent._get_reporting_plan, query)
+        return speculative
+
+    def _settle_speculation(self, speculative: dict, intent: str):
+        """Cancels speculative work the route won't use if it hasn't started; finished work stays cached."""
+        for route, future in speculative.items():
+            if intent not in (route, "both"):
+                future.cancel()
+
     def _get_intent(self, query: str):
         """Uses Gemini to detect if the query is GA4, SEO, or Both."""
         messages = [
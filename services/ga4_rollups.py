@@ -0,0 +1,311 @@
+"""
+services/ga4_rollups.py - Local store of GA4 daily rollups with incremental sync.
+
+For each property and configured (metrics, dimensions) spec we keep one row per
+day and dimension combination. Sync only fetches days that are new or still
+settling in GA4, and compatible reporting plans are answered by aggregating
+locally instead of querying GA4 for the whole window.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+import pandas as pd
+from core.config import settings
+from core.shared_cache import private_db_path
+from tools.ga4_tools import ADDITIVE_METRICS, NON_ADDITIVE_ACROSS, VALID_MATCH_TYPES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_rows (
+    property_id TEXT NOT NULL,
+    spec_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    dims TEXT NOT NULL,
+    metrics TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_rows ON rollup_rows (property_id, spec_id, day);
+CREATE TABLE IF NOT EXISTS sync_state (
+    property_id TEXT NOT NULL,
+    spec_id TEXT NOT NULL,
+    synced_from TEXT NOT NULL,
+    synced_to TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (property_id, spec_id)
+);
+"""
+
+PLAN_KEYS = {"property_id", "metrics", "dimensions", "date_ranges", "filters"}
+_DAYS_AGO_RE = re.compile(r"^(\d+)daysAgo$")
+
+
+def _resolve_date(value: str, today: date):
+    """Accepts ISO dates and GA4 relative dates (today, yesterday, NdaysAgo)."""
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - timedelta(days=1)
+    match = _DAYS_AGO_RE.match(value)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    return date.fromisoformat(value)
+
+
+def _to_iso_day(value) -> str:
+    # GA4 returns the date dimension as YYYYMMDD
+    value = str(value)
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def _number(value):
+    # GA4 returns metric values as strings; keep counts integral so sums stay exact
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return float(value or 0)
+
+
+def _ga4_value(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return str(round(value, 6))
+    return str(int(value))
+
+
+def _filters(plan: dict):
+    filters = plan.get("filters") or []
+    return [filters] if isinstance(filters, dict) else list(filters)
+
+
+def _matches(series: pd.Series, flt: dict) -> pd.Series:
+    match_type = (flt.get("match_type") or "EXACT").upper()
+    value = str(flt.get("value", ""))
+    case_sensitive = bool(flt.get("case_sensitive", False))
+    values = series.astype(str)
+    if not case_sensitive and match_type in ("EXACT", "CONTAINS", "BEGINS_WITH", "ENDS_WITH"):
+        values, value = values.str.lower(), value.lower()
+    if match_type == "EXACT":
+        return values == value
+    if match_type == "CONTAINS":
+        return values.str.contains(value, regex=False)
+    if match_type == "BEGINS_WITH":
+        return values.str.startswith(value)
+    if match_type == "ENDS_WITH":
+        return values.str.endswith(value)
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if match_type == "FULL_REGEXP":
+        return values.str.fullmatch(value, flags=flags)
+    return values.str.contains(value, flags=flags, regex=True)
+
+
+class GA4RollupStore:
+    def __init__(self, path: str = None, specs: list = None):
+        self.path = private_db_path(path or settings.ROLLUP_DB_PATH)
+        self.specs = []
+        for spec in (specs if specs is not None else settings.ROLLUP_SPECS):
+            dims = list(spec["dimensions"])
+            if "date" not in dims:
+                dims.insert(0, "date")
+            self.specs.append({"metrics": list(spec["metrics"]), "dimensions": dims})
+        self._local = threading.local()
+        # (property_id, spec_id) -> wall time before which a failed spec isn't retried
+        self._retry_at = {}
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def spec_id(spec: dict) -> str:
+        return ",".join(sorted(spec["metrics"])) + "|" + ",".join(sorted(spec["dimensions"]))
+
+    # --- Sync ---
+    def _spec_due(self, property_id: str, spec: dict, end: date) -> bool:
+        """A spec is due when it's missing days up to `end` or its settling window is stale."""
+        sid = self.spec_id(spec)
+        if time.time() < self._retry_at.get((property_id, sid), 0):
+            return False
+        row = self._conn().execute(
+            "SELECT synced_to, synced_at FROM sync_state WHERE property_id = ? AND spec_id = ?",
+            (property_id, sid)
+        ).fetchone()
+        if row is None or row[0] < end.isoformat():
+            return True
+        return time.time() - row[1] >= settings.ROLLUP_SYNC_INTERVAL
+
+    def sync_due(self, property_id: str, today: date = None) -> bool:
+        end = (today or date.today()) - timedelta(days=1)
+        return any(self._spec_due(property_id, spec, end) for spec in self.specs)
+
+    def sync(self, property_id: str, fetch_report, today: date = None, acquire=None):
+        """
+        Incrementally syncs every due spec for the property.
+        fetch_report(property_id, plan) must return GA4 rows (list of dicts) or {"error": ...}.
+        acquire() is called before each GA4 request; returning False ends the sync until the
+        next pass. Only complete days (up to yesterday) are stored, ROLLUP_SYNC_CHUNK_DAYS per
+        request, and sync_state only ever covers stored days.
+        Returns the first GA4 error (which stops the sync), or None.
+        """
+        today = today or date.today()
+        end = today - timedelta(days=1)
+        for spec in self.specs:
+            if not self._spec_due(property_id, spec, end):
+                continue
+            sid = self.spec_id(spec)
+            state = self._conn().execute(
+                "SELECT synced_from, synced_to FROM sync_state WHERE property_id = ? AND spec_id = ?",
+                (property_id, sid)
+            ).fetchone()
+            if state is None:
+                start = end - timedelta(days=settings.ROLLUP_BACKFILL_DAYS - 1)
+                synced_from, synced_to = start, None
+            else:
+                # New days plus the trailing days GA4 may still be revising
+                synced_from, synced_to = date.fromisoformat(state[0]), date.fromisoformat(state[1])
+                start = min(synced_to + timedelta(days=1),
+                            end - timedelta(days=settings.ROLLUP_SETTLING_DAYS - 1))
+
+            # Oldest chunk first, so coverage stays contiguous if a later chunk fails
+            while start <= end:
+                if acquire is not None and not acquire():
+                    return None
+                chunk_end = min(start + timedelta(days=settings.ROLLUP_SYNC_CHUNK_DAYS - 1), end)
+                plan = {
+                    "metrics": spec["metrics"],
+                    "dimensions": spec["dimensions"],
+                    "date_ranges": [[start.isoformat(), chunk_end.isoformat()]]
+                }
+                rows = fetch_report(property_id, plan)
+                if isinstance(rows, dict) and "error" in rows:
+                    print(f"Rollup sync failed for {sid} ({start} - {chunk_end}): {rows['error']}")
+                    # Back off this spec instead of retrying it on every scheduler pass
+                    self._retry_at[(property_id, sid)] = time.time() + settings.ROLLUP_RETRY_INTERVAL
+                    return rows["error"]
+                self._replace_days(property_id, sid, spec, start, chunk_end, rows or [])
+                synced_from = min(synced_from, start)
+                synced_to = chunk_end if synced_to is None else max(synced_to, chunk_end)
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO sync_state (property_id, spec_id, synced_from, synced_to, synced_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (property_id, sid, synced_from.isoformat(), synced_to.isoformat(), time.time())
+                )
+                start = chunk_end + timedelta(days=1)
+        return None
+
+    def _replace_days(self, property_id, sid, spec, start: date, end: date, rows: list):
+        other_dims = [d for d in spec["dimensions"] if d != "date"]
+        records = []
+        for row in rows:
+            records.append((
+                property_id, sid, _to_iso_day(row.get("date")),
+                json.dumps({d: row.get(d) for d in other_dims}),
+                json.dumps({m: _number(row.get(m)) for m in spec["metrics"]})
+            ))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM rollup_rows WHERE property_id = ? AND spec_id = ? AND day BETWEEN ? AND ?",
+                (property_id, sid, start.isoformat(), end.isoformat())
+            )
+            conn.executemany("INSERT INTO rollup_rows VALUES (?, ?, ?, ?, ?)", records)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Query answering ---
+    def answer(self, property_id: str, plan: dict, today: date = None):
+        """
+        Answers the plan from local rollups, returning GA4-shaped rows (list of dicts),
+        or None if no synced spec can answer it exactly.
+        """
+        today = today or date.today()
+        window = self._plan_window(plan, today)
+        if window is None:
+            return None
+        for spec in self.specs:
+            if self._compatible(spec, plan) and self._covers(property_id, spec, window):
+                return self._aggregate(property_id, spec, plan, window)
+        return None
+
+    def _plan_window(self, plan: dict, today: date):
+        if set(plan) - PLAN_KEYS:
+            return None
+        ranges = plan.get("date_ranges") or []
+        # Several ranges add GA4's dateRange dimension; leave those to the API
+        if len(ranges) != 1 or len(ranges[0]) != 2:
+            return None
+        try:
+            start, end = (_resolve_date(str(v), today) for v in ranges[0])
+        except ValueError:
+            return None
+        if start > end:
+            return None
+        return start, end
+
+    def _compatible(self, spec: dict, plan: dict) -> bool:
+        metrics = plan.get("metrics") or []
+        dims = plan.get("dimensions") or []
+        if not metrics or not set(metrics) <= set(spec["metrics"]):
+            return False
+        filters = _filters(plan)
+        filter_dims = {f.get("dimension") for f in filters}
+        if not set(dims) <= set(spec["dimensions"]) or not filter_dims <= set(spec["dimensions"]):
+            return False
+        if any((f.get("match_type") or "EXACT").upper() not in VALID_MATCH_TYPES for f in filters):
+            return False
+        # Rollup dimensions the plan sums over (filtering on them still sums the matching values)
+        collapsed = set(spec["dimensions"]) - set(dims)
+        for metric in metrics:
+            # Non-additive metrics can't be re-aggregated: the plan must select rollup rows as-is
+            if collapsed and metric not in ADDITIVE_METRICS:
+                return False
+            if collapsed & set(NON_ADDITIVE_ACROSS.get(metric, [])):
+                return False
+        return True
+
+    def _covers(self, property_id: str, spec: dict, window) -> bool:
+        row = self._conn().execute(
+            "SELECT synced_from, synced_to FROM sync_state WHERE property_id = ? AND spec_id = ?",
+            (property_id, self.spec_id(spec))
+        ).fetchone()
+        if row is None:
+            return False
+        return row[0] <= window[0].isoformat() and window[1].isoformat() <= row[1]
+
+    def _aggregate(self, property_id: str, spec: dict, plan: dict, window):
+        rows = self._conn().execute(
+            "SELECT day, dims, metrics FROM rollup_rows WHERE property_id = ? AND spec_id = ? AND day BETWEEN ? AND ?",
+            (property_id, self.spec_id(spec), window[0].isoformat(), window[1].isoformat())
+        ).fetchall()
+        metrics = plan["metrics"]
+        dims = plan.get("dimensions") or []
+        if not rows:
+            return []
+
+        df = pd.DataFrame([
+            {"date": day.replace("-", ""), **json.loads(d), **json.loads(m)} for day, d, m in rows
+        ])
+        for flt in _filters(plan):
+            df = df[_matches(df[flt["dimension"]], flt)]
+        if df.empty:
+            return []
+
+        if dims:
+            result = df.groupby(dims, as_index=False, dropna=False)[metrics].sum()
+            result = result.sort_values("date" if "date" in dims else metrics[0], ascending="date" in dims)
+        else:
+            result = df[metrics].sum().to_frame().T
+        # Same row shape as GA4Service: the API returns metric values as strings
+        return [
+            {k: _ga4_value(v) if k in metrics else v for k, v in row.items()}
+            for row in json.loads(result.to_json(orient="records"))
+        ]
@@ -1,29 +1,76 @@
-import pandas as pd
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from services.google_transport import GoogleTransport
 from core.config import settings
 
-class SheetsService:
+GA4_RUN_REPORT_URL = "https://analyticsdata.googleapis.com/v1beta/properties/{pid}:runReport"
+
+class GA4Service:
     def __init__(self):
-        self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-        # Load credentials directly from the file we placed in root
-        self.creds = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_APPLICATION_CREDENTIALS, scopes=self.scopes)
-        self.service = build('sheets', 'v4', credentials=self.creds)
+        self.scopes = ['https://www.googleapis.com/auth/analytics.readonly']
+        # Shared pooled transport; credentials come from the file placed in root
+        self.transport = GoogleTransport(self.scopes)
+
+    def run_analytics_report(self, property_id: str = None, plan: dict = None):
+        """
+        Runs a validated reporting plan through the GA4 Data API (runReport).
+        Returns a list of row dicts keyed by dimension/metric name, or {"error": ...}.
+        """
+        pid = property_id if property_id else settings.DEFAULT_GA4_PROPERTY_ID
+        dimensions = plan.get("dimensions", [])
+        metrics = plan.get("metrics", [])
 
-    def get_spreadsheet_data(self, spreadsheet_id: str = None):
-        sid = spreadsheet_id if spreadsheet_id else settings.DEFAULT_SHEET_ID
-        range_name = 'A1:Z1000' # Scans the first 1000 rows
-        
+        body = self._build_request(plan)
+        rows, total = [], 0
         try:
-            sheet = self.service.spreadsheets()
-            result = sheet.values().get(spreadsheetId=sid, range=range_name).execute()
-            values = result.get('values', [])
-            
-            if not values:
-                return pd.DataFrame()
-            
-            return pd.DataFrame(values[1:], columns=values[0])
+            # runReport returns at most `limit` rows per call; page until rowCount rows are read
+            while True:
+                meta = {}
+                page = self.transport.stream_array(
+                    "POST", GA4_RUN_REPORT_URL.format(pid=pid), "rows",
+                    json_body={**body, "limit": settings.GA4_REPORT_PAGE_SIZE, "offset": len(rows)},
+                    meta=meta
+                )
+                # Rows are decoded one at a time as they stream in; header order matches the request
+                read = 0
+                for row in page:
+                    rows.append({
+                        **{d: v.get("value") for d, v in zip(dimensions, row.get("dimensionValues", []))},
+                        **{m: v.get("value") for m, v in zip(metrics, row.get("metricValues", []))}
+                    })
+                    read += 1
+                # rowCount is omitted when the report is empty
+                total = int(meta.get("rowCount", 0))
+                if read == 0 or len(rows) >= total:
+                    break
         except Exception as e:
-            print(f"Sheets Error: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+            print(f"GA4 Error: {e}")
+            return {"error": str(e)}
+
+        if len(rows) < total:
+            # Never hand back a silently truncated report (rollup sync would store it as complete)
+            return {"error": f"GA4 returned {len(rows)} of {total} rows; the report changed while paging."}
+        return rows
+
+    def _build_request(self, plan: dict):
+        body = {
+            "dimensions": [{"name": d} for d in plan.get("dimensions", [])],
+            "metrics": [{"name": m} for m in plan.get("metrics", [])],
+            "dateRanges": [{"startDate": s, "endDate": e} for s, e in plan.get("date_ranges", [])]
+        }
+
+        filters = plan.get("filters") or []
+        expressions = [
+            {"filter": {
+                "fieldName": f["dimension"],
+                "stringFilter": {
+                    "matchType": f.get("match_type", "EXACT"),
+                    "value": f["value"],
+                    "caseSensitive": bool(f.get("case_sensitive", False))
+                }
+            }}
+            for f in ([filters] if isinstance(filters, dict) else filters)
+        ]
+        if len(expressions) == 1:
+            body["dimensionFilter"] = expressions[0]
+        elif expressions:
+            body["dimensionFilter"] = {"andGroup": {"expressions": expressions}}
+        return body
@@ -0,0 +1,187 @@
+"""
+services/google_transport.py - Pooled, thread-safe HTTP transport for Google REST APIs.
+
+Replaces the googleapiclient/httplib2 stack (not thread-safe, no pooling, whole
+response buffered) with a shared session per credential set. Responses are
+gzip-compressed on the wire and parsed incrementally: iter_json_array yields the
+rows of a large JSON array one at a time instead of materializing the payload.
+
+Backends (settings.GOOGLE_HTTP_BACKEND):
+- "requests": google-auth AuthorizedSession over a pooled urllib3 adapter (HTTP/1.1)
+- "httpx": HTTP/2 with connection multiplexing; requires the optional httpx[http2] package
+"""
+import json
+import threading
+from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession, Request
+from requests.adapters import HTTPAdapter
+from core.config import settings
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+# Characters that may continue a number: "1." or "1.5e" at a chunk end isn't complete yet
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+# Drop consumed text from the parse buffer once it grows past this many characters
+_COMPACT_AT = 1 << 16
+
+
+class GoogleAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Google API error {status}: {message}")
+        self.status = status
+
+
+class _JSONStream:
+    """Cursor over JSON text arriving in chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                if self.pos > _COMPACT_AT:
+                    self.buf, self.pos = self.buf[self.pos:], 0
+                self.buf += chunk
+                return True
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Next non-whitespace character (not consumed), or '' at end of input."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON stream: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value, pulling more chunks as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number touching the buffer end, or followed only by number characters
+                # (split after "." or "e"), may continue in the next chunk
+                partial_number = (
+                    isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and all(c in _NUMBER_CHARS for c in self.buf[end:])
+                )
+                if self.eof or not partial_number:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_array(chunks, key: str, meta: dict = None):
+    """
+    Yields the elements of the top-level array `key` from a stream of JSON text chunks.
+    Other top-level members are decoded into `meta` if given (complete once the
+    generator is exhausted), otherwise skipped; a missing key yields nothing.
+    """
+    stream = _JSONStream(chunks)
+    stream.expect("{")
+    while stream.peek() not in ("}", ""):
+        name = stream.value()
+        stream.expect(":")
+        if name != key:
+            value = stream.value()
+            if meta is not None:
+                meta[name] = value
+        else:
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.value()
+                if stream.peek() == ",":
+                    stream.pos += 1
+            stream.pos += 1
+        if stream.peek() == ",":
+            stream.pos += 1
+
+
+class _HttpxSession:
+    """HTTP/2 session with bearer-token auth refreshed from service-account credentials."""
+
+    def __init__(self, creds):
+        try:
+            import httpx
+        except ImportError:
+            raise RuntimeError("GOOGLE_HTTP_BACKEND='httpx' requires the optional 'httpx[http2]' package.")
+        self.creds = creds
+        self._refresh_lock = threading.Lock()
+        self._client = httpx.Client(
+            http2=True,
+            timeout=settings.GOOGLE_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.GOOGLE_HTTP_POOL_SIZE)
+        )
+
+    def _auth_headers(self) -> dict:
+        with self._refresh_lock:
+            if not self.creds.valid:
+                self.creds.refresh(Request())
+            return {"Authorization": f"Bearer {self.creds.token}"}
+
+    def stream(self, method, url, params=None, json_body=None):
+        with self._client.stream(method, url, params=params, json=json_body, headers=self._auth_headers()) as resp:
+            if resp.status_code >= 400:
+                raise GoogleAPIError(resp.status_code, resp.read().decode("utf-8", "replace")[:500])
+            yield from resp.iter_text()
+
+
+class _RequestsSession:
+    """google-auth AuthorizedSession with a connection pool sized for concurrent callers."""
+
+    def __init__(self, creds):
+        self._session = AuthorizedSession(creds)
+        adapter = HTTPAdapter(pool_connections=settings.GOOGLE_HTTP_POOL_SIZE,
+                              pool_maxsize=settings.GOOGLE_HTTP_POOL_SIZE)
+        self._session.mount("https://", adapter)
+
+    def stream(self, method, url, params=None, json_body=None):
+        resp = self._session.request(
+            method, url, params=params, json=json_body, stream=True,
+            headers={"Accept-Encoding": "gzip"}, timeout=settings.GOOGLE_HTTP_TIMEOUT
+        )
+        with resp:
+            if resp.status_code >= 400:
+                raise GoogleAPIError(resp.status_code, resp.text[:500])
+            resp.encoding = "utf-8"
+            yield from resp.iter_content(chunk_size=settings.GOOGLE_HTTP_CHUNK_SIZE, decode_unicode=True)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class GoogleTransport:
+    """One shared, thread-safe session per scope set, reused by every service instance."""
+
+    def __init__(self, scopes: list):
+        key = (settings.GOOGLE_HTTP_BACKEND, tuple(sorted(scopes)))
+        with _sessions_lock:
+            if key not in _sessions:
+                creds = service_account.Credentials.from_service_account_file(
+                    settings.GOOGLE_APPLICATION_CREDENTIALS, scopes=scopes)
+                backend = _HttpxSession if settings.GOOGLE_HTTP_BACKEND == "httpx" else _RequestsSession
+                _sessions[key] = backend(creds)
+            self._session = _sessions[key]
+
+    def stream_array(self, method: str, url: str, key: str, params: dict = None, json_body: dict = None,
+                     meta: dict = None):
+        """Yields the items of response[key] as they arrive; other top-level members go into `meta`."""
+        return iter_json_array(self._session.stream(method, url, params=params, json_body=json_body), key, meta)
@@ -1,7 +1,25 @@
+from urllib.parse import quote
 import pandas as pd
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from core.config import settings
+from services.google_transport import GoogleTransport
+
+SHEETS_VALUES_URL = "https://sheets.googleapis.com/v4/spreadsheets/{sid}/values/{range}"
+
+def frame_from_rows(rows):
+    """
+    Builds a DataFrame column by column from an iterator of Sheets rows (header first),
+    without materializing the list-of-lists. Sheets omits trailing empty cells, so
+    short rows are padded with None.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if not header:
+        return pd.DataFrame()
+    width = len(header)
+    columns = [[] for _ in range(width)]
+    for row in rows:
+        for i in range(width):
+            columns[i].append(row[i] if i < len(row) else None)
+    return pd.DataFrame(dict(zip(range(width), columns))).set_axis(header, axis=1)
 
 class SheetsService:
     def __init__(self):
@@ -12,32 +30,23 @@ class SheetsService:
         # Define the scope for reading spreadsheets
         self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
         
-        # Load credentials from the root-level JSON file
-        self.creds = Credentials.from_service_account_file(
-            settings.GA4_CREDENTIALS_PATH, 
-            scopes=self.scopes
-        )
-        self.service = build('sheets', 'v4', credentials=self.creds)
+        # Shared pooled transport (credentials loaded from the root-level JSON file)
+        self.transport = GoogleTransport(self.scopes)
 
     def get_spreadsheet_data(self, spreadsheet_id: str, range_name: str = "A:Z"):
         """
         Fetches data from a Google Sheet and returns a Pandas DataFrame.
         """
         try:
-            # Call the Sheets API
-            sheet = self.service.spreadsheets()
-            result = sheet.values().get(
-                spreadsheetId=spreadsheet_id, 
-                range=range_name
-            ).execute()
-            
-            values = result.get('values', [])
-
-            if not values:
-                return pd.DataFrame()
+            # Call the Sheets API, streaming rows straight into the column builder
+            url = SHEETS_VALUES_URL.format(sid=quote(spreadsheet_id, safe=""), range=quote(range_name, safe=""))
+            rows = self.transport.stream_array("GET", url, "values", params={"majorDimension": "ROWS"})
 
             # The first row is typically the header (Address, Title, Indexability, etc.)
-            df = pd.DataFrame(values[1:], columns=values[0])
+            df = frame_from_rows(rows)
+
+            if len(df.columns) == 0:
+                return df
             
             # Sanitization: Ensure column names are lowercase and underscores for easier AI logic
             df.columns = df.columns.str.lower().str.replace(' ', '_')
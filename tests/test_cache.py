@@ -0,0 +1,45 @@
+import os
+import threading
+from core.cache import TTLCache
+from core.shared_cache import SharedStore
+
+
+def test_single_flight_load_and_lock_cleanup():
+    cache = TTLCache(60)
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(1)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=("key", loader)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert cache._key_locks == {}
+
+
+def test_hot_keys_only_count_recent_lookups():
+    cache = TTLCache(60)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    assert cache.hot_keys(5, 60) == ["a", "b"]
+    assert cache.hot_keys(5, 0) == []
+
+
+def test_hot_keys_merge_other_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    leader = TTLCache(60, shared=SharedStore(path, "reports"))
+    follower = TTLCache(60, shared=SharedStore(path, "reports"))
+    for _ in range(3):
+        follower.get(("p", "plan-b"))
+    leader.get(("p", "plan-a"))
+    # Pretend the follower is another process
+    follower._shared_history.set(os.getpid() + 1, {"pid": os.getpid() + 1, "counts": follower._recent_counts(60)}, 9e12)
+    assert leader.hot_keys(2, 60) == [("p", "plan-b"), ("p", "plan-a")]
@@ -0,0 +1,59 @@
+from datetime import date
+import pytest
+from tools.ga4_plan_compiler import compile_reporting_plan, plan_cache_key, resolve_field
+
+TODAY = date(2026, 10, 19)
+
+
+def test_repairs_names_dates_and_filters():
+    plan = compile_reporting_plan({
+        "metrics": ["users", "Sessions", "sessions"],
+        "dimensions": [{"name": "source"}],
+        "date_ranges": ["last 7 days"],
+        "filters": {"fieldName": "page", "matchType": "starts_with", "value": "https://example.com/blog"}
+    }, TODAY)
+    assert plan == {
+        "metrics": ["activeUsers", "sessions"],
+        "dimensions": ["sessionSource"],
+        "date_ranges": [["2026-10-12", "2026-10-18"]],
+        "filters": {"dimension": "pagePath", "match_type": "BEGINS_WITH", "value": "/blog"}
+    }
+
+
+def test_defaults_and_relative_api_dates():
+    assert compile_reporting_plan({"metrics": ["sessions"]}, TODAY)["date_ranges"] == [["2026-09-21", "2026-10-18"]]
+    plan = compile_reporting_plan({
+        "metrics": ["sessions"],
+        "date_ranges": [{"startDate": "7daysAgo", "endDate": "today"}],
+        "property_id": "properties/123"
+    }, TODAY)
+    assert plan["date_ranges"] == [["2026-10-12", "2026-10-19"]]
+    assert plan["property_id"] == "123"
+
+
+def test_typos_resolve_but_different_fields_do_not():
+    assert resolve_field("sessoins", "metric") == "sessions"
+    assert resolve_field("keyEvents", "metric") == "conversions"
+    for name in ("engagedSessions", "totalUsers", "newUsers", "purchaseRevenue", "userEngagementDuration"):
+        assert resolve_field(name, "metric") is None
+    assert resolve_field("sessionDefaultChannelGroup", "dimension") == "channelGroup"
+    # Event-scoped counterpart of the session channel group
+    for name in ("firstUserSource", "pageLocation", "pagePathPlusQueryString", "defaultChannelGroup"):
+        assert resolve_field(name, "dimension") is None
+
+
+def test_unrepairable_plans_raise():
+    with pytest.raises(ValueError):
+        compile_reporting_plan({"metrics": ["engagedSessions"]}, TODAY)
+    with pytest.raises(ValueError):
+        compile_reporting_plan({"metrics": []}, TODAY)
+    with pytest.raises(ValueError):
+        compile_reporting_plan({"metrics": ["sessions"], "date_ranges": [["2027-01-01", "2027-01-31"]]}, TODAY)
+    with pytest.raises(ValueError):
+        compile_reporting_plan({"metrics": ["sessions"], "filters": {"dimension": "page", "match_type": "FUZZY", "value": "/"}}, TODAY)
+
+
+def test_cache_key_is_order_insensitive():
+    a = compile_reporting_plan({"metrics": ["sessions", "users"], "dimensions": ["country", "date"]}, TODAY)
+    b = compile_reporting_plan({"metrics": ["activeUsers", "sessions"], "dimensions": ["date", "country"]}, TODAY)
+    assert plan_cache_key(a) == plan_cache_key(b)
@@ -0,0 +1,119 @@
+from datetime import date
+import pytest
+from services.ga4_rollups import GA4RollupStore
+
+TODAY = date(2026, 10, 19)
+DAY = "2026-10-18"
+
+SPECS = [
+    {"metrics": ["sessions"], "dimensions": ["date"]},
+    {"metrics": ["sessions", "screenPageViews", "activeUsers"], "dimensions": ["date", "pagePath"]}
+]
+
+# One session viewing both blog pages: 11 sessions site-wide, 18 when summed over pages
+GA4_ROWS = {
+    "date": [{"date": "20261018", "sessions": "11"}],
+    "pagePath": [
+        {"date": "20261018", "pagePath": "/blog/a", "sessions": "10", "screenPageViews": "12", "activeUsers": "9"},
+        {"date": "20261018", "pagePath": "/blog/b", "sessions": "8", "screenPageViews": "9", "activeUsers": "7"}
+    ]
+}
+
+
+def fake_report(property_id, plan):
+    start, end = (d.replace("-", "") for d in plan["date_ranges"][0])
+    rows = GA4_ROWS["pagePath" if "pagePath" in plan["dimensions"] else "date"]
+    return [row for row in rows if start <= row["date"] <= end]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GA4RollupStore(str(tmp_path / "rollups.sqlite3"), SPECS)
+    store.sync("p", fake_report, today=TODAY)
+    return store
+
+
+def plan(metrics, dimensions=(), filters=None, start=DAY, end=DAY):
+    plan = {"metrics": list(metrics), "dimensions": list(dimensions), "date_ranges": [[start, end]]}
+    if filters:
+        plan["filters"] = filters
+    return plan
+
+
+BLOG = {"dimension": "pagePath", "match_type": "BEGINS_WITH", "value": "/blog"}
+
+
+def test_rows_have_ga4_shape(store):
+    # Same string values GA4Service returns for the same plan
+    assert store.answer("p", plan(["sessions"], ["date"]), TODAY) == [{"date": "20261018", "sessions": "11"}]
+
+
+def test_additive_metrics_sum_across_pages(store):
+    assert store.answer("p", plan(["screenPageViews"], filters=BLOG), TODAY) == [{"screenPageViews": "21"}]
+    assert store.answer("p", plan(["sessions"]), TODAY) == [{"sessions": "11"}]
+
+
+def test_sessions_are_not_summed_across_pages(store):
+    assert store.answer("p", plan(["sessions"], filters=BLOG), TODAY) is None
+    rows = store.answer("p", plan(["sessions"], ["date", "pagePath"]), TODAY)
+    assert sorted(int(r["sessions"]) for r in rows) == [8, 10]
+
+
+def test_non_additive_metrics_need_exact_grain(store):
+    assert store.answer("p", plan(["activeUsers"], ["pagePath"]), TODAY) is None
+    assert len(store.answer("p", plan(["activeUsers"], ["date", "pagePath"]), TODAY)) == 2
+
+
+def test_uncovered_window_goes_to_ga4(store):
+    assert store.answer("p", plan(["sessions"], start="2026-01-01"), TODAY) is None
+    assert store.answer("p", plan(["sessions"], end="2026-10-19"), TODAY) is None
+
+
+def test_failed_chunk_is_not_marked_synced(tmp_path):
+    store = GA4RollupStore(str(tmp_path / "rollups.sqlite3"), SPECS[:1])
+
+    def failing_report(property_id, plan):
+        if plan["date_ranges"][0][1] >= "2026-10-01":
+            return {"error": "quota exhausted"}
+        return fake_report(property_id, plan)
+
+    store.sync("p", failing_report, today=TODAY)
+    # Chunks before the failure stay usable; nothing from the failed chunk on is claimed
+    assert store.answer("p", plan(["sessions"], start="2026-07-21", end="2026-09-28"), TODAY) == []
+    assert store.answer("p", plan(["sessions"]), TODAY) is None
+
+
+def test_quota_is_charged_per_chunk(tmp_path):
+    store = GA4RollupStore(str(tmp_path / "rollups.sqlite3"), SPECS)
+    calls, budget = [], iter([True] * 5)
+
+    def counting_report(property_id, plan):
+        calls.append(plan)
+        return fake_report(property_id, plan)
+
+    store.sync("p", counting_report, today=TODAY, acquire=lambda: next(budget, False))
+    assert len(calls) == 5
+    assert store.sync_due("p", TODAY)
+    # The next pass resumes where the budget ran out
+    store.sync("p", counting_report, today=TODAY)
+    assert not store.sync_due("p", TODAY)
+    assert store.answer("p", plan(["sessions"]), TODAY) == [{"sessions": "11"}]
+
+
+def test_failing_spec_backs_off_and_others_stay_synced(tmp_path):
+    store = GA4RollupStore(str(tmp_path / "rollups.sqlite3"), SPECS)
+    store.sync("p", fake_report, today=TODAY)
+    calls = []
+
+    def page_reports_fail(property_id, plan):
+        calls.append(plan)
+        if "pagePath" in plan["dimensions"]:
+            return {"error": "429 quota exhausted"}
+        return fake_report(property_id, plan)
+
+    # The next day only brings new days; the failing spec returns its error to the caller
+    assert store.sync("p", page_reports_fail, today=date(2026, 10, 20)) == "429 quota exhausted"
+    calls.clear()
+    # Neither the failed spec (backing off) nor the synced one is fetched again on the next pass
+    store.sync("p", page_reports_fail, today=date(2026, 10, 20))
+    assert calls == []
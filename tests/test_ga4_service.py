@@ -0,0 +1,62 @@
+import json
+from services.ga4_service import GA4Service
+from services.google_transport import iter_json_array
+from core.config import settings
+
+PLAN = {"metrics": ["sessions"], "dimensions": ["pagePath"], "date_ranges": [["2026-10-01", "2026-10-07"]]}
+ROWS = [{"dimensionValues": [{"value": f"/p{i}"}], "metricValues": [{"value": str(i)}]} for i in range(5)]
+
+
+class FakeTransport:
+    """Serves runReport pages from ROWS, streamed in small chunks like the real transport."""
+
+    def __init__(self, rows=ROWS, row_count=None):
+        self.rows = rows
+        self.row_count = len(rows) if row_count is None else row_count
+        self.requests = []
+
+    def stream_array(self, method, url, key, params=None, json_body=None, meta=None):
+        self.requests.append(json_body)
+        offset, limit = json_body["offset"], json_body["limit"]
+        page = {"rows": self.rows[offset:offset + limit]} if self.rows[offset:offset + limit] else {}
+        if self.row_count:
+            page["rowCount"] = self.row_count
+        text = json.dumps(page)
+        return iter_json_array([text[i:i + 7] for i in range(0, len(text), 7)], key, meta)
+
+
+def service(transport):
+    # Skips __init__, which loads service-account credentials
+    svc = GA4Service.__new__(GA4Service)
+    svc.transport = transport
+    return svc
+
+
+def test_pages_until_row_count(monkeypatch):
+    monkeypatch.setattr(settings, "GA4_REPORT_PAGE_SIZE", 2)
+    transport = FakeTransport()
+    rows = service(transport).run_analytics_report("123", PLAN)
+    assert rows == [{"pagePath": f"/p{i}", "sessions": str(i)} for i in range(5)]
+    assert [(r["offset"], r["limit"]) for r in transport.requests] == [(0, 2), (2, 2), (4, 2)]
+
+
+def test_short_read_is_an_error(monkeypatch):
+    monkeypatch.setattr(settings, "GA4_REPORT_PAGE_SIZE", 2)
+    # GA4 claims 6 rows but the last page comes back empty
+    result = service(FakeTransport(row_count=6)).run_analytics_report("123", PLAN)
+    assert "error" in result and "5 of 6" in result["error"]
+
+
+def test_empty_report_has_no_row_count():
+    transport = FakeTransport(rows=[], row_count=0)
+    assert service(transport).run_analytics_report("123", PLAN) == []
+    assert len(transport.requests) == 1
+
+
+def test_request_body_carries_filters():
+    plan = {**PLAN, "filters": {"dimension": "pagePath", "match_type": "BEGINS_WITH", "value": "/blog"}}
+    transport = FakeTransport()
+    service(transport).run_analytics_report("123", plan)
+    body = transport.requests[0]
+    assert body["dateRanges"] == [{"startDate": "2026-10-01", "endDate": "2026-10-07"}]
+    assert body["dimensionFilter"]["filter"]["stringFilter"]["matchType"] == "BEGINS_WITH"
@@ -0,0 +1,55 @@
+from datetime import date
+from tools.ga4_templates import build_plan_from_template, resolve_date_expression
+
+TODAY = date(2026, 10, 19)  # A Monday
+
+
+def test_page_filter_keeps_path_case():
+    plan = build_plan_from_template("users for /Pricing in the last 14 days", TODAY)
+    assert plan == {
+        "metrics": ["activeUsers"],
+        "dimensions": [],
+        "date_ranges": [["2026-10-05", "2026-10-18"]],
+        "filters": {"dimension": "pagePath", "match_type": "EXACT", "value": "/Pricing"}
+    }
+
+
+def test_page_group_phrases_filter_by_prefix():
+    for query in ("views of /blog pages last month", "page views for /blog/ last month",
+                  "views of posts under /blog last month", "views of the /blog section last month"):
+        plan = build_plan_from_template(query, TODAY)
+        assert plan["filters"]["match_type"] == "BEGINS_WITH", query
+        assert plan["filters"]["value"].rstrip("/") == "/blog"
+    # A single page stays an exact match
+    assert build_plan_from_template("views of the /blog page last month", TODAY)["filters"]["match_type"] == "EXACT"
+
+
+def test_dimension_and_trend_phrases():
+    assert build_plan_from_template("top sources by sessions this month", TODAY)["dimensions"] == ["sessionSource"]
+    plan = build_plan_from_template("daily users for the past week", TODAY)
+    assert plan["dimensions"] == ["date"]
+    assert plan["date_ranges"] == [["2026-10-12", "2026-10-18"]]
+
+
+def test_home_page_and_absolute_range():
+    plan = build_plan_from_template("page views on the home page yesterday", TODAY)
+    assert plan["metrics"] == ["screenPageViews"]
+    assert plan["filters"]["value"] == "/"
+    plan = build_plan_from_template("sessions by country from 2026-09-01 to 2026-09-30", TODAY)
+    assert plan["dimensions"] == ["country"]
+    assert plan["date_ranges"] == [["2026-09-01", "2026-09-30"]]
+
+
+def test_unrecognized_intent_falls_back_to_llm():
+    assert build_plan_from_template("How many organic users did we get last week?", TODAY) is None
+    assert build_plan_from_template("sessions last week vs the week before", TODAY) is None
+    assert build_plan_from_template("users for /blog and /about last month", TODAY) is None
+    assert build_plan_from_template("which pages are missing a title tag", TODAY) is None
+
+
+def test_resolve_date_expression():
+    assert resolve_date_expression("last 14 days", TODAY) == ["2026-10-05", "2026-10-18"]
+    assert resolve_date_expression("last week", TODAY) == ["2026-10-12", "2026-10-18"]
+    assert resolve_date_expression("last month", TODAY) == ["2026-09-01", "2026-09-30"]
+    assert resolve_date_expression("this month", TODAY) == ["2026-10-01", "2026-10-19"]
+    assert resolve_date_expression("14 days", TODAY) is None
@@ -0,0 +1,69 @@
+import json
+import random
+import pytest
+from services.google_transport import iter_json_array
+
+PAYLOAD = {
+    "dimensionHeaders": [{"name": "pagePath"}],
+    "rows": [
+        {"dimensionValues": [{"value": "/blog/café?q=\"1,2\""}], "metricValues": [{"value": "12"}]},
+        {"dimensionValues": [{"value": "/"}], "metricValues": [{"value": "0.5324"}]},
+        [1.5, -2, 3e5, 1.25E-3, 0, -0.0, 12345678901234567890, True, False, None],
+        {"nested": {"a": [[], {}], "b": "\\u00e9 \\\\ }]"}},
+        1.5,
+        1.5e3,
+        "tail"
+    ],
+    "rowCount": 7,
+    "metadata": {"currencyCode": "USD"}
+}
+TEXT = json.dumps(PAYLOAD, indent=1)
+
+
+def parse(chunks):
+    meta = {}
+    rows = list(iter_json_array(chunks, "rows", meta))
+    return rows, meta
+
+
+def test_whole_payload():
+    rows, meta = parse([TEXT])
+    assert rows == PAYLOAD["rows"]
+    assert meta == {"dimensionHeaders": PAYLOAD["dimensionHeaders"], "rowCount": 7, "metadata": PAYLOAD["metadata"]}
+
+
+def test_every_two_chunk_split():
+    for i in range(len(TEXT) + 1):
+        rows, meta = parse([TEXT[:i], TEXT[i:]])
+        assert rows == PAYLOAD["rows"], f"split at {i}: {TEXT[max(0, i - 5):i]!r}|{TEXT[i:i + 5]!r}"
+        assert meta["rowCount"] == 7
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_small_chunks(seed):
+    rng = random.Random(seed)
+    chunks, pos = [], 0
+    while pos < len(TEXT):
+        size = rng.randint(1, 8)
+        chunks.append(TEXT[pos:pos + size])
+        pos += size
+    assert parse(chunks)[0] == PAYLOAD["rows"]
+
+
+@pytest.mark.parametrize("number", ["1.5", "-0.25", "1.5e3", "2E-10", "-12e+4", "1234567"])
+def test_number_split_at_every_position(number):
+    text = '{"rows": [' + number + ', ' + number + ']}'
+    for i in range(len(text) + 1):
+        assert parse([text[:i], text[i:]])[0] == [json.loads(number)] * 2, f"split at {i}"
+
+
+def test_missing_key_and_empty_array():
+    assert parse(['{"rowCount": 0}']) == ([], {"rowCount": 0})
+    assert parse(['{"rows": [], "rowCount": 0}'])[0] == []
+
+
+def test_malformed_input_raises():
+    with pytest.raises(ValueError):
+        parse(['["not", "an", "object"]'])
+    with pytest.raises(ValueError):
+        parse(['{"rows": [1, 2'])
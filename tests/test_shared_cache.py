@@ -0,0 +1,49 @@
+import os
+import pytest
+from core import shared_cache
+from core.shared_cache import SharedStore, private_db_path
+
+posix_only = pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+
+
+def test_creates_private_file(tmp_path):
+    path = str(tmp_path / "data" / "cache.sqlite3")
+    store = SharedStore(path, "ns")
+    store.set("key", {"rows": [1, 2]}, expires_at=9e12)
+    assert store.get("key")[1] == {"rows": [1, 2]}
+    if os.name != "nt":
+        assert os.stat(tmp_path / "data").st_mode & 0o777 == 0o700
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+@posix_only
+def test_refuses_shared_writable_directory_and_file(tmp_path):
+    open_dir = tmp_path / "open"
+    open_dir.mkdir()
+    os.chmod(open_dir, 0o777)
+    with pytest.raises(PermissionError):
+        private_db_path(str(open_dir / "cache.sqlite3"))
+
+    path = tmp_path / "cache.sqlite3"
+    path.touch()
+    os.chmod(path, 0o666)
+    with pytest.raises(PermissionError):
+        private_db_path(str(path))
+
+
+@posix_only
+def test_refuses_symlinked_file(tmp_path):
+    target = tmp_path / "elsewhere.sqlite3"
+    target.touch()
+    os.symlink(target, tmp_path / "cache.sqlite3")
+    with pytest.raises(PermissionError):
+        private_db_path(str(tmp_path / "cache.sqlite3"))
+
+
+def test_windows_mode_bits_are_not_checked(tmp_path, monkeypatch):
+    # Windows reports writable files as 0o666; only the POSIX checks may reject them
+    monkeypatch.setattr(shared_cache, "_POSIX_PERMISSIONS", False)
+    path = tmp_path / "cache.sqlite3"
+    path.touch()
+    os.chmod(path, 0o666)
+    assert private_db_path(str(path)) == str(path)
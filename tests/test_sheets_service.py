@@ -0,0 +1,31 @@
+from services.sheets_service import frame_from_rows
+
+
+def test_builds_columns_and_pads_short_rows():
+    df = frame_from_rows(iter([
+        ["Address", "Status Code", "Title 1"],
+        ["https://example.com/", "200", "Home"],
+        ["https://example.com/old"],
+        ["https://example.com/a", "301"]
+    ]))
+    assert list(df.columns) == ["Address", "Status Code", "Title 1"]
+    # Padded cells are missing values (None or NaN depending on the pandas string dtype)
+    assert df["Status Code"].isna().tolist() == [False, True, False]
+    assert df["Status Code"].dropna().tolist() == ["200", "301"]
+    assert df["Title 1"].isna().tolist() == [False, True, True]
+
+
+def test_extra_cells_beyond_header_are_dropped():
+    df = frame_from_rows([["a"], ["1", "ignored"]])
+    assert df.to_dict("records") == [{"a": "1"}]
+
+
+def test_empty_sheet():
+    assert frame_from_rows([]).empty
+    assert frame_from_rows(iter([])).columns.tolist() == []
+
+
+def test_header_only():
+    df = frame_from_rows([["a", "b"]])
+    assert list(df.columns) == ["a", "b"]
+    assert len(df) == 0
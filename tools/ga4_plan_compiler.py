@@ -0,0 +1,219 @@
+"""
+tools/ga4_plan_compiler.py - Local repair and canonicalization of GA4 reporting plans.
+
+LLM plans often use near-miss field names ("users", "source"), relative dates
+("last 7 days") or loose filter shapes. Instead of failing validation or
+re-prompting, compile_reporting_plan fixes these deterministically and returns a
+canonical plan whose JSON form (see plan_cache_key) is stable enough to key caches on.
+"""
+import json
+import re
+from datetime import date, datetime, timedelta
+from urllib.parse import urlparse
+from tools.ga4_tools import (
+    VALID_METRICS, VALID_DIMENSIONS, VALID_MATCH_TYPES, METRIC_SYNONYMS, DIMENSION_SYNONYMS,
+    MAX_METRICS, MAX_DIMENSIONS, DEFAULT_PROPERTY_ID
+)
+from tools.ga4_templates import resolve_date_expression
+
+# API-style spellings and renames the LLM tends to emit, on top of the NL synonym tables.
+# Only exact equivalents belong here: a different GA4 field (engagedSessions, totalUsers,
+# firstUserSource, ...) must fail validation rather than silently answer another question.
+FIELD_ALIASES = {
+    "activeuser": "activeUsers",
+    "pageview": "screenPageViews", "screenpageview": "screenPageViews",
+    "session": "sessions",
+    "revenue": "totalRevenue",
+    "keyevents": "conversions",  # GA4 renamed conversions to key events
+    "page": "pagePath",
+    "source": "sessionSource", "medium": "sessionMedium",
+    "device": "deviceCategory", "channel": "channelGroup",
+    "sessiondefaultchannelgroup": "channelGroup"
+}
+
+MATCH_TYPE_ALIASES = {
+    "EQUALS": "EXACT", "EQ": "EXACT", "IS": "EXACT",
+    "STARTS_WITH": "BEGINS_WITH", "PREFIX": "BEGINS_WITH",
+    "SUFFIX": "ENDS_WITH",
+    "REGEX": "PARTIAL_REGEXP", "REGEXP": "PARTIAL_REGEXP", "MATCHES": "FULL_REGEXP"
+}
+
+# GA4 UI default window when the plan omits dates
+DEFAULT_WINDOW_DAYS = 28
+
+_DAYS_AGO_RE = re.compile(r"^(\d+)\s*daysago$")
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _build_lookup(valid: list, synonyms: dict) -> dict:
+    lookup = {_normalize(v): v for v in valid}
+    for phrase, target in list(synonyms.items()) + list(FIELD_ALIASES.items()):
+        if target in valid:
+            lookup.setdefault(_normalize(phrase), target)
+    return lookup
+
+
+_METRIC_LOOKUP = _build_lookup(VALID_METRICS, METRIC_SYNONYMS)
+_DIMENSION_LOOKUP = _build_lookup(VALID_DIMENSIONS, DIMENSION_SYNONYMS)
+
+
+def resolve_field(name: str, kind: str):
+    """Maps a metric/dimension name onto the valid list; None if nothing is close enough."""
+    lookup = _METRIC_LOOKUP if kind == "metric" else _DIMENSION_LOOKUP
+    key = _normalize(name)
+    if key in lookup:
+        return lookup[key]
+    # Typos: closest known spelling within ~25% of the name's length
+    best, best_distance = None, max(1, len(key) // 4) + 1
+    for candidate, target in lookup.items():
+        distance = _edit_distance(key, candidate)
+        if distance < best_distance:
+            best, best_distance = target, distance
+    return best
+
+
+def _resolve_fields(names, kind: str) -> list:
+    if isinstance(names, str):
+        names = [names]
+    resolved = []
+    for name in names or []:
+        if isinstance(name, dict):  # GA4 API style {"name": "sessions"}
+            name = name.get("name", "")
+        field = resolve_field(name, kind)
+        if field is None:
+            raise ValueError(f"Invalid or unsupported {kind}: {name}")
+        if field not in resolved:
+            resolved.append(field)
+    return sorted(resolved)
+
+
+def _resolve_date(value, today: date) -> date:
+    text = str(value).strip()
+    lowered = text.lower()
+    if lowered == "today":
+        return today
+    if lowered == "yesterday":
+        return today - timedelta(days=1)
+    match = _DAYS_AGO_RE.match(lowered)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    for fmt in ("%Y-%m-%d", "%Y%m%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date in range: {value}")
+
+
+def _compile_date_ranges(ranges, today: date) -> list:
+    if not ranges:
+        return [[(today - timedelta(days=DEFAULT_WINDOW_DAYS)).isoformat(),
+                 (today - timedelta(days=1)).isoformat()]]
+    if isinstance(ranges, (str, dict)) or (
+            isinstance(ranges, list) and len(ranges) == 2 and all(isinstance(v, str) for v in ranges)):
+        ranges = [ranges]  # A single range that wasn't wrapped in a list
+
+    compiled = []
+    for item in ranges:
+        if isinstance(item, str):
+            # Relative phrase such as "last 14 days"
+            resolved = resolve_date_expression(item, today)
+            if resolved is None:
+                raise ValueError(f"Invalid date range: {item}")
+            start, end = (date.fromisoformat(v) for v in resolved)
+        elif isinstance(item, dict):
+            start = _resolve_date(item.get("start_date") or item.get("startDate"), today)
+            end = _resolve_date(item.get("end_date") or item.get("endDate"), today)
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            start, end = (_resolve_date(v, today) for v in item)
+        else:
+            raise ValueError(f"Invalid date range: {item}")
+        if start > end:
+            start, end = end, start
+        end = min(end, today)
+        if start > end:
+            raise ValueError(f"Date range is entirely in the future: {item}")
+        pair = [start.isoformat(), end.isoformat()]
+        if pair not in compiled:
+            compiled.append(pair)
+    return compiled
+
+
+def _compile_filter(raw: dict) -> dict:
+    dimension = resolve_field(raw.get("dimension") or raw.get("fieldName") or "", "dimension")
+    if dimension is None:
+        raise ValueError(f"Invalid or unsupported filter dimension: {raw.get('dimension')}")
+
+    match_type = str(raw.get("match_type") or raw.get("matchType") or "EXACT").upper().replace(" ", "_")
+    match_type = MATCH_TYPE_ALIASES.get(match_type, match_type)
+    if match_type not in VALID_MATCH_TYPES:
+        raise ValueError(f"Invalid filter match_type: {raw.get('match_type')}")
+
+    value = str(raw.get("value", "")).strip()
+    if not value:
+        raise ValueError(f"Filter on {dimension} has no value")
+    if dimension in ("pagePath", "landingPage") and match_type in ("EXACT", "BEGINS_WITH"):
+        # Full URLs and bare slugs become GA4 page paths
+        if "://" in value:
+            value = urlparse(value).path or "/"
+        elif not value.startswith("/"):
+            value = "/" + value
+
+    compiled = {"dimension": dimension, "match_type": match_type, "value": value}
+    if raw.get("case_sensitive"):
+        compiled["case_sensitive"] = True
+    return compiled
+
+
+def compile_reporting_plan(plan: dict, today: date = None) -> dict:
+    """
+    Repairs and canonicalizes a reporting plan.
+    Raises ValueError only when the plan can't be repaired (e.g. a field with no close valid name).
+    """
+    if not isinstance(plan, dict):
+        raise ValueError("Reporting plan must be a JSON object")
+    today = today or date.today()
+
+    metrics = _resolve_fields(plan.get("metrics"), "metric")
+    dimensions = _resolve_fields(plan.get("dimensions"), "dimension")
+    if not metrics:
+        raise ValueError("Reporting plan has no metrics")
+    if len(metrics) > MAX_METRICS or len(dimensions) > MAX_DIMENSIONS:
+        raise ValueError(f"GA4 allows at most {MAX_METRICS} metrics and {MAX_DIMENSIONS} dimensions per report")
+
+    compiled = {
+        "metrics": metrics,
+        "dimensions": dimensions,
+        "date_ranges": _compile_date_ranges(plan.get("date_ranges") or plan.get("dateRanges"), today)
+    }
+
+    property_id = str(plan.get("property_id") or DEFAULT_PROPERTY_ID).replace("properties/", "")
+    if property_id != DEFAULT_PROPERTY_ID:
+        compiled["property_id"] = property_id
+
+    filters = plan.get("filters") or []
+    filters = [filters] if isinstance(filters, dict) else list(filters)
+    filters = sorted((_compile_filter(f) for f in filters), key=lambda f: json.dumps(f, sort_keys=True))
+    if len(filters) == 1:
+        compiled["filters"] = filters[0]
+    elif filters:
+        compiled["filters"] = filters
+    return compiled
+
+
+def plan_cache_key(plan: dict) -> str:
+    """Stable JSON form of a compiled plan, used as the report cache key."""
+    return json.dumps(plan, sort_keys=True, separators=(",", ":"))
@@ -0,0 +1,212 @@
+"""
+tools/ga4_templates.py - Deterministic GA4 plan synthesis for common query shapes.
+
+Recognizes questions like "users for /pricing in the last 14 days",
+"top sources by sessions this month" or "daily users for the past week"
+and builds the reporting plan locally, skipping the LLM planner round-trip.
+Anything outside these shapes returns None so the caller can fall back to Gemini.
+"""
+import re
+from datetime import date, timedelta
+from tools.ga4_tools import METRIC_SYNONYMS, DIMENSION_SYNONYMS, validate_reporting_plan
+
+NUMBER_WORDS = {
+    "a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "fourteen": 14, "thirty": 30, "ninety": 90
+}
+
+# Words that may remain after all recognized phrases are consumed.
+# Any other leftover word means the query carries intent we can't express,
+# e.g. "organic", "mobile", "compare", so the LLM planner takes over.
+FILLER_WORDS = {
+    "how", "many", "much", "what", "whats", "which", "were", "was", "is", "are", "the", "a", "an",
+    "for", "in", "on", "of", "our", "my", "we", "did", "do", "does", "get", "got", "give", "show",
+    "me", "us", "list", "tell", "total", "number", "count", "site", "website", "had", "have", "has",
+    "during", "over", "to", "by", "top", "most", "highest", "with", "and", "all", "please", "page",
+    "pages", "report", "across", "at", "each", "per", "there", "been", "overall", "can", "you", "i",
+    "see", "from", "visited", "viewed", "popular", "breakdown", "split", "grouped", "received",
+    "drove", "brought", "generated", "sent"
+}
+
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+_ISO = r"(\d{4}-\d{2}-\d{2})"
+# A page path plus any words marking it as a group of pages ("/blog pages", "posts under /blog")
+_PATH_RE = re.compile(
+    r"(?P<before>\b(?:pages|posts|articles) (?:in|under|within|inside) (?:the )?)?"
+    r"(?<![\w/])(?P<path>/[A-Za-z0-9\-._~%/]*)"
+    r"(?P<after> (?:pages|section|posts|articles|directory|folder)\b)?",
+    re.IGNORECASE
+)
+_HOMEPAGE_RE = re.compile(r"\b(?:home ?page)\b")
+_TREND_RE = re.compile(r"\b(?:daily|trend|over time|day by day)\b")
+
+
+def _as_number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _rolling(days: int, today: date):
+    # GA4 UI convention: N complete days ending yesterday
+    return today - timedelta(days=days), today - timedelta(days=1)
+
+
+def _last_calendar_month(today: date):
+    end = today.replace(day=1) - timedelta(days=1)
+    return end.replace(day=1), end
+
+
+def _last_calendar_week(today: date):
+    start = today - timedelta(days=today.weekday() + 7)
+    return start, start + timedelta(days=6)
+
+
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+# (pattern, resolver(match, today) -> (start, end)), tried in order
+DATE_PATTERNS = [
+    (re.compile(r"\b(?:from|between) " + _ISO + r" (?:to|and|through|until) " + _ISO + r"\b"),
+     lambda m, t: (date.fromisoformat(m.group(1)), date.fromisoformat(m.group(2)))),
+    (re.compile(r"\bsince " + _ISO + r"\b"),
+     lambda m, t: (date.fromisoformat(m.group(1)), t)),
+    (re.compile(r"\b(?:on )?" + _ISO + r"\b"),
+     lambda m, t: (date.fromisoformat(m.group(1)),) * 2),
+    (re.compile(r"\b(?:in |over |during |for )?(?:the )?(?:last|past|previous) " + _NUMBER + r" (day|week|month)s?\b"),
+     lambda m, t: _rolling(_as_number(m.group(1)) * _UNIT_DAYS[m.group(2)], t)),
+    (re.compile(r"\b(?:in |over |during |for )?(?:the )?past (day|week|month|year)\b"),
+     lambda m, t: _rolling(_UNIT_DAYS[m.group(1)], t)),
+    (re.compile(r"\b(?:in |during |for )?(?:the )?(?:last|previous) week\b"),
+     lambda m, t: _last_calendar_week(t)),
+    (re.compile(r"\b(?:in |during |for )?(?:the )?(?:last|previous) month\b"),
+     lambda m, t: _last_calendar_month(t)),
+    (re.compile(r"\b(?:in |during |for )?(?:the )?(?:last|previous) year\b"),
+     lambda m, t: (date(t.year - 1, 1, 1), date(t.year - 1, 12, 31))),
+    (re.compile(r"\b(?:in |during |for )?this week\b|\bweek to date\b"),
+     lambda m, t: (t - timedelta(days=t.weekday()), t)),
+    (re.compile(r"\b(?:in |during |for )?this month\b|\bmonth to date\b|\bmtd\b"),
+     lambda m, t: (t.replace(day=1), t)),
+    (re.compile(r"\b(?:in |during |for )?this year\b|\byear to date\b|\bytd\b"),
+     lambda m, t: (t.replace(month=1, day=1), t)),
+    (re.compile(r"\b(?:for )?yesterday\b"),
+     lambda m, t: (t - timedelta(days=1),) * 2),
+    (re.compile(r"\b(?:for )?today\b"),
+     lambda m, t: (t, t)),
+]
+
+
+def _alternation(phrases) -> str:
+    # Longest phrases first so "page views" wins over "views"
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+# "traffic" is a metric unless it qualifies a dimension ("traffic sources")
+_METRIC_RE = re.compile(r"\b(" + _alternation(METRIC_SYNONYMS) + r")\b(?! ?sources?\b)")
+_DIMENSION_RE = re.compile(
+    r"\b(?:by|per|each|which|across|top(?: \d+)?|breakdown by|split by|grouped by) (?:the )?("
+    + _alternation(DIMENSION_SYNONYMS) + r")\b"
+)
+
+
+def _consume(text: str, match) -> str:
+    return text[:match.start()] + " " + text[match.end():]
+
+
+def _extract_date_range(text: str, today: date):
+    """Returns (text_without_date, [start, end]) or (text, None) if no single date expression is found."""
+    found = None
+    for pattern, resolver in DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        if found is not None:
+            return text, None  # Multiple date expressions (e.g. comparisons) go to the LLM
+        try:
+            start, end = resolver(match, today)
+        except ValueError:
+            return text, None
+        if start > end:
+            return text, None
+        found = [start.isoformat(), end.isoformat()]
+        text = _consume(text, match)
+    return text, found
+
+
+def resolve_date_expression(text: str, today: date = None):
+    """
+    Resolves a standalone relative date phrase ("last 14 days", "this month")
+    to [start, end] ISO dates, or None if it isn't exactly one known expression.
+    """
+    today = today or date.today()
+    rest, date_range = _extract_date_range(re.sub(r"\s+", " ", text.lower()).strip(), today)
+    if date_range is None or rest.strip():
+        return None
+    return date_range
+
+
+def build_plan_from_template(query: str, today: date = None):
+    """
+    Parses a NL analytics question into a validated GA4 reporting plan.
+    Returns None when the query doesn't fit a known shape.
+    """
+    today = today or date.today()
+    text = query.lower().strip()
+
+    # 1. Page-path filter ("/pricing", "/blog pages", "home page")
+    # GA4 page paths are case-sensitive, so take them from the original query
+    paths = []
+    for match in _PATH_RE.finditer(re.sub(r"\s+", " ", query)):
+        path = match.group("path")
+        is_group = match.group("before") or match.group("after") or (len(path) > 1 and path.endswith("/"))
+        paths.append((path, "BEGINS_WITH" if is_group else "EXACT"))
+    if _HOMEPAGE_RE.search(text):
+        paths.append(("/", "EXACT"))
+    if len(paths) > 1:
+        return None
+    text = _HOMEPAGE_RE.sub(" ", _PATH_RE.sub(" ", re.sub(r"\s+", " ", text)))
+    text = re.sub(r"[?!,.;:'\"]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+
+    # 2. Relative or absolute date range
+    text, date_range = _extract_date_range(text, today)
+    if date_range is None:
+        return None
+
+    # 3. Metrics
+    metrics = []
+    for match in _METRIC_RE.finditer(text):
+        metric = METRIC_SYNONYMS[match.group(1)]
+        if metric not in metrics:
+            metrics.append(metric)
+    if not metrics:
+        return None
+    text = _METRIC_RE.sub(" ", text)
+
+    # 4. Dimensions ("by country", "top sources", "daily")
+    dimensions = []
+    if _TREND_RE.search(text):
+        dimensions.append("date")
+        text = _TREND_RE.sub(" ", text)
+    for match in _DIMENSION_RE.finditer(text):
+        dimension = DIMENSION_SYNONYMS[match.group(1)]
+        if dimension not in dimensions:
+            dimensions.append(dimension)
+    text = _DIMENSION_RE.sub(" ", text)
+
+    # 5. Anything we didn't understand means this isn't a template query
+    if any(word not in FILLER_WORDS for word in text.split()):
+        return None
+
+    plan = {
+        "metrics": metrics,
+        "dimensions": dimensions,
+        "date_ranges": [date_range]
+    }
+    if paths:
+        path, match_type = paths[0]
+        plan["filters"] = {"dimension": "pagePath", "match_type": match_type, "value": path}
+
+    try:
+        validate_reporting_plan(plan)
+    except ValueError:
+        return None
+    return plan
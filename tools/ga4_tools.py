@@ -1,6 +1,7 @@
 """
 tools/ga4_tools.py - Schema and validation for GA4 reporting tools.
 """
+import re
 
 # Hardcoded Property ID for Property: 516810413
 DEFAULT_PROPERTY_ID = "516810413"
@@ -18,6 +19,59 @@ VALID_DIMENSIONS = [
     "landingPage", "channelGroup"
 ]
 
+# Every metric/dimension above is event- or session-scoped, and GA4 accepts any
+# combination of them, so plans aren't checked for field compatibility. Adding
+# item-scoped or first-user fields would need a compatibility table here.
+
+# Filter match types accepted by the GA4 stringFilter
+VALID_MATCH_TYPES = [
+    "EXACT", "CONTAINS", "BEGINS_WITH", "ENDS_WITH", "FULL_REGEXP", "PARTIAL_REGEXP"
+]
+
+# Metrics that can be summed across days and dimension values.
+# Users-based and ratio metrics (activeUsers, bounceRate, ...) are de-duplicated
+# or averaged by GA4 and must not be re-aggregated locally.
+ADDITIVE_METRICS = [
+    "sessions", "screenPageViews", "eventCount", "conversions", "totalRevenue"
+]
+
+# Additive metrics that still can't be summed across some dimensions.
+# sessions is session-scoped: a session viewing two pages is counted under both
+# pagePath values, so summing over hit-scoped dimensions over-counts. Summing
+# across date and session-scoped dimensions (sessionSource, landingPage, ...) is fine.
+NON_ADDITIVE_ACROSS = {
+    "sessions": ["pagePath", "pageTitle"]
+}
+
+# Natural-language phrases mapped onto VALID_METRICS / VALID_DIMENSIONS.
+# Used by the template parser (tools/ga4_templates.py) and plan compiler (tools/ga4_plan_compiler.py).
+METRIC_SYNONYMS = {
+    "active users": "activeUsers", "users": "activeUsers", "visitors": "activeUsers",
+    "sessions": "sessions", "visits": "sessions", "traffic": "sessions",
+    "page views": "screenPageViews", "pageviews": "screenPageViews", "views": "screenPageViews",
+    "engagement rate": "engagementRate",
+    "average engagement time": "averageEngagementTime", "engagement time": "averageEngagementTime",
+    "time on site": "averageEngagementTime",
+    "event count": "eventCount", "events": "eventCount",
+    "conversions": "conversions",
+    "total revenue": "totalRevenue", "revenue": "totalRevenue",
+    "bounce rate": "bounceRate"
+}
+
+DIMENSION_SYNONYMS = {
+    "page": "pagePath", "pages": "pagePath", "url": "pagePath", "urls": "pagePath", "path": "pagePath",
+    "page title": "pageTitle", "page titles": "pageTitle", "title": "pageTitle", "titles": "pageTitle",
+    "day": "date", "days": "date", "date": "date",
+    "source": "sessionSource", "sources": "sessionSource", "traffic source": "sessionSource",
+    "traffic sources": "sessionSource", "referrer": "sessionSource", "referrers": "sessionSource",
+    "medium": "sessionMedium", "mediums": "sessionMedium",
+    "country": "country", "countries": "country",
+    "city": "city", "cities": "city",
+    "device": "deviceCategory", "devices": "deviceCategory", "device category": "deviceCategory",
+    "landing page": "landingPage", "landing pages": "landingPage",
+    "channel": "channelGroup", "channels": "channelGroup"
+}
+
 # This schema tells Gemini exactly how to format the tool output
 GA4_REPORTING_TOOL_SCHEMA = {
     "name": "run_ga4_report",
@@ -53,6 +107,7 @@ GA4_REPORTING_TOOL_SCHEMA = {
                 "type": "object",
                 "properties": {
                     "dimension": {"type": "string", "enum": VALID_DIMENSIONS},
+                    "match_type": {"type": "string", "enum": VALID_MATCH_TYPES},
                     "value": {"type": "string"}
                 },
                 "description": "Optional dimension filter (e.g., filter by specific page path)."
@@ -62,6 +117,12 @@ GA4_REPORTING_TOOL_SCHEMA = {
     }
 }
 
+# GA4 Data API request limits
+MAX_METRICS = 10
+MAX_DIMENSIONS = 9
+
+_DATE_VALUE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}|today|yesterday|\d+daysAgo)$")
+
 def validate_reporting_plan(plan: dict):
     """
     Server-side validation of GA4 fields before calling the API.
@@ -81,5 +142,21 @@ def validate_reporting_plan(plan: dict):
     for d in plan.get("dimensions", []):
         if d not in VALID_DIMENSIONS:
             raise ValueError(f"Invalid or unsupported dimension: {d}")
+
+    # Validate Date Ranges
+    for date_range in plan.get("date_ranges", []):
+        if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+            raise ValueError(f"Invalid date range: {date_range}")
+        for value in date_range:
+            if not isinstance(value, str) or not _DATE_VALUE_RE.match(value):
+                raise ValueError(f"Invalid date in range: {value}")
+
+    # Validate Filters
+    filters = plan.get("filters") or []
+    for f in ([filters] if isinstance(filters, dict) else filters):
+        if f.get("dimension") not in VALID_DIMENSIONS:
+            raise ValueError(f"Invalid or unsupported filter dimension: {f.get('dimension')}")
+        if f.get("match_type", "EXACT") not in VALID_MATCH_TYPES:
+            raise ValueError(f"Invalid filter match_type: {f.get('match_type')}")
             
     return True
\ No newline at end of file